@@ -82,10 +82,67 @@ WSGI_APPLICATION = 'morph.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
-DATABASES = {
+# MORPH_DB_ENGINE selects the profile:
+#   sqlite   (default) WAL journal, synchronous=NORMAL, mmap and a busy timeout so concurrent chat
+#            and progress writes wait for the lock instead of failing with "database is locked".
+#   postgres persistent connections, or a psycopg pool (pip install "psycopg[pool]") when
+#            MORPH_DB_POOL_MAX_SIZE > 0. Django's pool requires CONN_MAX_AGE = 0.
+
+DB_ENGINE = os.environ.get("MORPH_DB_ENGINE", "sqlite")
+DB_CONN_MAX_AGE = int(os.environ.get("MORPH_DB_CONN_MAX_AGE", 60))
+
+if DB_ENGINE == "postgres":
+    DB_POOL_MAX_SIZE = int(os.environ.get("MORPH_DB_POOL_MAX_SIZE", 0))
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get("MORPH_DB_NAME", "morph"),
+            'USER': os.environ.get("MORPH_DB_USER", "morph"),
+            'PASSWORD': os.environ.get("MORPH_DB_PASSWORD", ""),
+            'HOST': os.environ.get("MORPH_DB_HOST", "localhost"),
+            'PORT': os.environ.get("MORPH_DB_PORT", "5432"),
+            'CONN_MAX_AGE': 0 if DB_POOL_MAX_SIZE else DB_CONN_MAX_AGE,
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {
+                "pool": {
+                    "min_size": int(os.environ.get("MORPH_DB_POOL_MIN_SIZE", 2)),
+                    "max_size": DB_POOL_MAX_SIZE,
+                    "timeout": 10,
+                },
+            } if DB_POOL_MAX_SIZE else {},
+        }
+    }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get("MORPH_DB_PATH", BASE_DIR / 'db.sqlite3'),
+            'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {
+                # Seconds a writer waits for the lock before raising "database is locked".
+                "timeout": 20,
+                # Take the write lock at BEGIN; upgrading a read lock mid-transaction fails without waiting.
+                "transaction_mode": "IMMEDIATE",
+                "init_command": (
+                    "PRAGMA journal_mode=WAL;"
+                    "PRAGMA synchronous=NORMAL;"
+                    "PRAGMA mmap_size=134217728;"
+                    "PRAGMA cache_size=-20000;"
+                    "PRAGMA temp_store=MEMORY;"
+                ),
+            },
+        }
+    }
+
+
+# Cache
+# The lesson catalogue version lives here. Use a backend shared by all workers (e.g. Redis or
+# FileBasedCache) so `load_lessons` run from another process invalidates every worker.
+
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
     }
 }
 
@@ -133,6 +190,61 @@ AUTH_USER_MODEL = "morph_auth.User"
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 REST_FRAMEWORK = {
-    "DEFAULT_AUTHENTICATION_CLASSES": ["rest_framework.authentication.TokenAuthentication"],
+    "DEFAULT_AUTHENTICATION_CLASSES": ["morph_auth.authentication.CachedTokenAuthentication"],
     "DEFAULT_PERMISSION_CLASSES": ["rest_framework.permissions.IsAuthenticated"],
-}
\ No newline at end of file
+}
+
+# Token -> user lookups are cached per process so authenticated requests skip the token/user join.
+# Set the alias to a shared cache (e.g. Redis) to share entries and invalidations between workers;
+# the TTL bounds how stale another worker's local copy can be.
+MORPH_AUTH_TOKEN_CACHE_TTL = 30
+MORPH_AUTH_TOKEN_CACHE_SIZE = 10000
+MORPH_AUTH_TOKEN_CACHE_ALIAS = None
+
+# Chat tracing: every sink receives one JSON-serialisable record per chat request.
+# The in-process registry behind /api/ai/metrics/ is always enabled.
+MORPH_AI_METRICS_SINKS = ["morph_ai.rag.metrics.JsonLogSink"]
+
+# Admission control in front of the local Ollama instance. MAX_CONCURRENCY is shared by all worker
+# processes on the host through lock files in LOCK_DIR (POSIX only; None limits each process alone).
+# The queue is per process: a sync WSGI worker holds at most one waiter, so run uvicorn for queueing.
+MORPH_AI_LLM_MAX_CONCURRENCY = 2
+MORPH_AI_LLM_LOCK_DIR = BASE_DIR / ".locks" / "llm"
+MORPH_AI_LLM_MAX_QUEUE = 16
+MORPH_AI_LLM_QUEUE_TIMEOUT = 30
+
+# Chat turns are buffered in-process and written with one bulk INSERT per batch, off the request
+# path. /history/ can lag a fresh turn by up to the flush interval; pending rows are flushed at exit.
+MORPH_AI_CHATLOG_WRITE_BEHIND = True
+MORPH_AI_CHATLOG_BATCH_SIZE = 100
+MORPH_AI_CHATLOG_FLUSH_INTERVAL = 0.5
+
+# Model backends. "fake" swaps Ollama for the deterministic stand-ins in morph_ai.rag.fakes
+# (used by `bench_chat` and CI boxes without network or GPU).
+MORPH_AI_BACKEND = os.environ.get("MORPH_AI_BACKEND", "ollama")
+MORPH_AI_FAKE_OPTIONS = {
+    "latency": 0.05,
+    "prefill_tokens_per_sec": 2000,
+    "tokens_per_sec": 40,
+    "embed_latency": 0.005,
+}
+MORPH_AI_VECTORDB_DIR = os.environ.get("MORPH_AI_VECTORDB_DIR", os.path.join(BASE_DIR, "morph_ai", "rag", "vectordb"))
+
+# Tokens of progress, history and retrieved chunks packed into each prompt. Raise it for models
+# with a larger context window; prompt prefill time grows with it.
+MORPH_AI_CONTEXT_TOKEN_BUDGET = 1536
+
+# On-disk query-embedding cache next to the vector store; pruned by age and row count as it grows.
+MORPH_AI_QUERY_CACHE_MAX_ENTRIES = 50_000
+MORPH_AI_QUERY_CACHE_MAX_AGE = 30 * 24 * 60 * 60
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {
+        "console": {"class": "logging.StreamHandler"},
+    },
+    "loggers": {
+        "morph_ai.metrics": {"handlers": ["console"], "level": "INFO", "propagate": False},
+    },
+}
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class MorphAiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'morph_ai'
+
+    def ready(self):
+        from . import signals  # noqa: F401
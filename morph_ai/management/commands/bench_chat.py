@@ -0,0 +1,258 @@
+import io
+import json
+import random
+import shutil
+import tempfile
+import threading
+import time
+from collections import Counter
+from datetime import timedelta
+from pathlib import Path
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.test import Client, override_settings
+from rest_framework.authtoken.models import Token
+
+from morph_auth.benchmarks import (
+    LESSON_TITLES, percentile, seed_chat_logs, seed_users, throwaway_database, write_comparison,
+)
+from morph_auth.models import LessonProgress
+from morph_ai.rag import chat_service, vector_store
+from morph_ai.rag.admission import get_admission
+from morph_ai.rag.answer_cache import answer_cache
+from morph_ai.rag.chat_writer import get_chat_writer
+from morph_ai.rag.intents import get_exemplars
+from morph_ai.rag.metrics import STAGE_METRIC, registry
+from morph_lesson.loader import MEDIA_DIR
+
+CHAT_URL = "/api/ai/chat/"
+QUESTION_TEMPLATES = [
+    "Apa yang dipelajari di {heading}?",
+    "Saya sudah paham {heading}, lanjut ke mana?",
+    "Jelaskan singkat {heading}",
+    "{language} halaman {page} membahas apa?",
+    "lanjut ke halaman berikutnya",
+]
+SINGLETONS = [
+    vector_store.get_embedding, vector_store.get_store, vector_store.get_lexical_index,
+    vector_store.get_retriever, chat_service.get_llm, chat_service.get_llm_chain, get_admission,
+    get_exemplars, get_chat_writer,
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Drive ChatView concurrently against a throwaway database and vector store using the "
+        "deterministic fake LLM/embeddings, then report throughput, latency percentiles and stages."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=20)
+        parser.add_argument("--logs-per-user", type=int, default=50)
+        parser.add_argument("--requests", type=int, default=100)
+        parser.add_argument("--concurrency", type=int, default=8, help="Client threads sending requests.")
+        parser.add_argument("--stream", action="store_true", help="Use the SSE variant of the chat endpoint.")
+        parser.add_argument("--latency", type=float, default=0.05, help="Fixed LLM overhead per call (s).")
+        parser.add_argument("--prefill-tokens-per-sec", type=float, default=2000)
+        parser.add_argument("--tokens-per-sec", type=float, default=200)
+        parser.add_argument("--embed-latency", type=float, default=0.005, help="Per embedding call (s).")
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--label", default="current", help="Name stored with the results, e.g. before/after.")
+        parser.add_argument("--output", help="Write the report to this JSON file.")
+        parser.add_argument("--compare-to", help="JSON report from an earlier run to diff against.")
+
+    def handle(self, *args, **options):
+        workdir = Path(tempfile.mkdtemp(prefix="morph-bench-"))
+        fake = {
+            "latency": options["latency"],
+            "prefill_tokens_per_sec": options["prefill_tokens_per_sec"],
+            "tokens_per_sec": options["tokens_per_sec"],
+            "embed_latency": options["embed_latency"],
+        }
+        try:
+            with throwaway_database(workdir):
+                try:
+                    with override_settings(
+                        MORPH_AI_BACKEND="fake",
+                        MORPH_AI_FAKE_OPTIONS=fake,
+                        MORPH_AI_VECTORDB_DIR=str(workdir / "vectordb"),
+                        MORPH_AI_METRICS_SINKS=[],
+                    ):
+                        report = self.run_bench(options)
+                finally:
+                    if get_chat_writer.is_loaded():
+                        get_chat_writer().close()
+                    for loader in SINGLETONS:
+                        loader.reset()
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+        report["label"] = options["label"]
+        report["config"] = {key: options[key] for key in (
+            "users", "logs_per_user", "requests", "concurrency", "stream",
+            "latency", "prefill_tokens_per_sec", "tokens_per_sec", "embed_latency",
+        )}
+        self.print_report(report)
+        if options["output"]:
+            Path(options["output"]).write_text(json.dumps(report, indent=2))
+            self.stdout.write(f"Saved report to {options['output']}")
+        if options["compare_to"]:
+            self.compare(json.loads(Path(options["compare_to"]).read_text()), report)
+
+    def run_bench(self, options) -> dict:
+        for loader in SINGLETONS:
+            loader.reset()
+        answer_cache.clear()
+
+        start = time.perf_counter()
+        if MEDIA_DIR.exists():
+            call_command("load_lessons", stdout=io.StringIO())
+        stats = vector_store.sync_store(progress=None)
+        index_seconds = time.perf_counter() - start
+        self.stdout.write(f"Indexed {stats['added']} chunks with fake embeddings ({index_seconds:.2f}s)")
+
+        rng = random.Random(options["seed"])
+        tokens = self.seed(rng, options["users"], options["logs_per_user"])
+        questions = self.questions(rng, options["requests"])
+        registry.reset()
+
+        work = list(zip(questions, (tokens[i % len(tokens)] for i in range(len(questions)))))
+        results, lock = [], threading.Lock()
+        path = CHAT_URL + ("?stream=1" if options["stream"] else "")
+
+        def worker():
+            client = Client()
+            try:
+                while True:
+                    with lock:
+                        if not work:
+                            return
+                        question, token = work.pop()
+                    results.append(self.send(client, path, question, token))
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=worker) for _ in range(max(1, options["concurrency"]))]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        wall = time.perf_counter() - start
+
+        start = time.perf_counter()
+        get_chat_writer().flush()
+        self.stdout.write(f"Flushed buffered chat logs in {(time.perf_counter() - start) * 1000:.1f} ms")
+        return self.summarize(results, wall, index_seconds)
+
+    def seed(self, rng: random.Random, users: int, logs_per_user: int) -> list:
+        seeded = seed_users("bench", users)
+        logs = seed_chat_logs(seeded, rng, logs_per_user, max_age=timedelta(days=30), min_age=timedelta(minutes=1))
+
+        progress = [
+            LessonProgress(user=user, title=title, page=rng.randint(1, 10))
+            for user in seeded
+            for title in rng.sample(LESSON_TITLES, rng.randint(0, len(LESSON_TITLES)))
+        ]
+        LessonProgress.objects.bulk_create(progress, batch_size=2000)
+
+        self.stdout.write(f"Seeded {len(seeded)} users, {logs} chat logs, {len(progress)} progress rows")
+        return [Token.objects.create(user=user).key for user in seeded]
+
+    def questions(self, rng: random.Random, count: int) -> list:
+        indexed = vector_store.get_store().get(include=["metadatas"])["metadatas"]
+        sections = [meta for meta in indexed if meta and meta.get("page")]
+        questions = []
+        for _ in range(count):
+            meta = rng.choice(sections)
+            heading = meta["heading"].rsplit(" > ", 1)[-1].split(":", 1)[-1].strip()
+            questions.append(rng.choice(QUESTION_TEMPLATES).format(
+                heading=heading, language=meta["language"], page=meta["page"]
+            ))
+        return questions
+
+    def send(self, client: Client, path: str, question: str, token: str) -> dict:
+        start = time.perf_counter()
+        response = client.post(
+            path, {"role": "user", "content": question},
+            content_type="application/json", HTTP_AUTHORIZATION=f"Token {token}",
+        )
+        status, first = response.status_code, None
+        if response.streaming:
+            for part in response.streaming_content:
+                if first is None:
+                    first = time.perf_counter() - start
+                if part.startswith(b"event: error"):
+                    status = "stream_error"
+        return {"status": status, "seconds": time.perf_counter() - start, "first": first}
+
+    def summarize(self, results: list, wall: float, index_seconds: float) -> dict:
+        seconds = [r["seconds"] for r in results if r["status"] == 200]
+        firsts = [r["first"] for r in results if r["status"] == 200 and r["first"] is not None]
+        summary = registry.summary()
+
+        stages = {}
+        prefix = STAGE_METRIC + '{stage="'
+        for name, snapshot in summary["histograms"].items():
+            if name.startswith(prefix):
+                stages[name[len(prefix):-2]] = {
+                    "mean": snapshot["sum"] / snapshot["count"] if snapshot["count"] else 0.0,
+                    "p50": snapshot["p50"],
+                    "p95": snapshot["p95"],
+                }
+
+        return {
+            "requests": len(results),
+            "wall_seconds": wall,
+            "throughput": len(results) / wall if wall else 0.0,
+            "index_seconds": index_seconds,
+            "statuses": dict(Counter(str(r["status"]) for r in results)),
+            "outcomes": {
+                name.split('"')[1]: value for name, value in summary["counters"].items()
+                if name.startswith("morph_chat_requests_total")
+            },
+            "latency": {
+                "mean": sum(seconds) / len(seconds) if seconds else 0.0,
+                "p50": percentile(seconds, 0.50),
+                "p95": percentile(seconds, 0.95),
+                "p99": percentile(seconds, 0.99),
+            },
+            "first_event": {"p50": percentile(firsts, 0.50), "p95": percentile(firsts, 0.95)} if firsts else None,
+            "stages": stages,
+        }
+
+    def print_report(self, report: dict) -> None:
+        self.stdout.write(self.style.MIGRATE_HEADING(f"\n== {report['label']}"))
+        self.stdout.write(
+            f"{report['requests']} requests in {report['wall_seconds']:.2f}s "
+            f"({report['throughput']:.1f} req/s) statuses={report['statuses']} outcomes={report['outcomes']}"
+        )
+        latency = report["latency"]
+        self.stdout.write(
+            f"latency mean {latency['mean'] * 1000:.1f} ms  p50 {latency['p50'] * 1000:.1f} ms  "
+            f"p95 {latency['p95'] * 1000:.1f} ms  p99 {latency['p99'] * 1000:.1f} ms"
+        )
+        if report["first_event"]:
+            first = report["first_event"]
+            self.stdout.write(f"first event p50 {first['p50'] * 1000:.1f} ms  p95 {first['p95'] * 1000:.1f} ms")
+        for stage, values in sorted(report["stages"].items()):
+            self.stdout.write(
+                f"  {stage:<16} mean {values['mean'] * 1000:8.2f} ms  "
+                f"p50 {values['p50'] * 1000:8.2f} ms  p95 {values['p95'] * 1000:8.2f} ms"
+            )
+
+    def compare(self, baseline: dict, report: dict) -> None:
+        if baseline.get("config") != report["config"]:
+            self.stdout.write(self.style.WARNING("Configurations differ; numbers are not directly comparable."))
+        rows = [("throughput", baseline["throughput"], report["throughput"], "/s", True)]
+        rows += [
+            (f"latency {q}", baseline["latency"][q] * 1000, report["latency"][q] * 1000, "ms", False)
+            for q in ("p50", "p95", "p99")
+        ]
+        rows += [
+            (f"{stage} p50", baseline["stages"][stage]["p50"] * 1000, values["p50"] * 1000, "ms", False)
+            for stage, values in sorted(report["stages"].items()) if stage in baseline["stages"]
+        ]
+        write_comparison(self, baseline, report, rows)
@@ -0,0 +1,58 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from morph_ai.rag.vector_store import sync_store, EMBED_BATCH_SIZE, EMBED_WORKERS
+
+
+class Command(BaseCommand):
+    help = "Re-embed only added or changed RAG chunks and drop chunks whose source is gone."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Report what would change without touching the index.",
+        )
+        parser.add_argument(
+            "--rebuild",
+            action="store_true",
+            help="Drop every indexed chunk and embed the whole corpus again.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=EMBED_BATCH_SIZE,
+            help="Chunks sent to Ollama per embedding request.",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=EMBED_WORKERS,
+            help="Maximum concurrent embedding requests.",
+        )
+
+    def report_progress(self, done, total, elapsed):
+        rate = done / elapsed if elapsed else 0.0
+        self.stdout.write(f"  embedded {done}/{total} chunks ({rate:.1f} chunks/s)")
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        stats = sync_store(
+            dry_run=options["dry_run"],
+            rebuild=options["rebuild"],
+            batch_size=options["batch_size"],
+            workers=options["workers"],
+            progress=self.report_progress,
+        )
+        elapsed = time.perf_counter() - start
+
+        prefix = "[dry-run] " if options["dry_run"] else ""
+        self.stdout.write(
+            f"{prefix}added={stats['added']} updated={stats['updated']} deleted={stats['deleted']} "
+            f"unchanged={stats['unchanged']} ({elapsed:.2f}s)"
+        )
+        if "chunks_per_sec" in stats:
+            self.stdout.write(
+                f"embedding: {stats['embed_seconds']:.2f}s, {stats['chunks_per_sec']:.1f} chunks/s"
+            )
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from morph_ai.rag.chat_service import warmup
+
+
+class Command(BaseCommand):
+    help = "Load the retriever and LLM client before the first chat request."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--ping",
+            action="store_true",
+            help="Send a short prompt so Ollama loads the model into memory.",
+        )
+
+    def handle(self, *args, **options):
+        timings = warmup(ping=options["ping"])
+        for name, seconds in timings.items():
+            self.stdout.write(f"{name:<10}: {seconds:.2f}s")
+        self.stdout.write(self.style.SUCCESS("RAG stack is warm."))
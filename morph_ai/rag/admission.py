@@ -0,0 +1,273 @@
+import asyncio
+import math
+import os
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from pathlib import Path
+
+from django.conf import settings
+
+try:
+    import fcntl
+except ImportError:  # Windows: slots are only limited per process there.
+    fcntl = None
+
+from .lazy import lazy_singleton
+from .metrics import registry
+
+__all__ = ["AdmissionController", "Overloaded", "QueueFull", "QueueTimeout", "SharedSlots", "get_admission"]
+
+DEFAULT_MAX_CONCURRENCY = 2
+DEFAULT_MAX_QUEUE = 16
+DEFAULT_QUEUE_TIMEOUT = 30.0
+HOLD_TIME_SMOOTHING = 0.2
+SHARED_POLL_INTERVAL = 0.05
+
+
+class Overloaded(Exception):
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class QueueFull(Overloaded):
+    pass
+
+
+class QueueTimeout(Overloaded):
+    pass
+
+
+class _Ticket:
+    __slots__ = ("loop", "future", "granted")
+
+    def __init__(self, loop=None):
+        self.loop = loop
+        self.future = loop.create_future() if loop is not None else None
+        self.granted = False
+
+
+def _resolve(future) -> None:
+    if not future.done():
+        future.set_result(None)
+
+
+class SharedSlots:
+    # One flock()ed file per slot, shared by every worker process on the host. The kernel drops
+    # a lock when its descriptor closes, so a crashed worker never leaks its slot.
+    def __init__(self, directory, count: int):
+        self.directory = Path(directory)
+        self.count = count
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def try_acquire(self):
+        for n in range(self.count):
+            fd = os.open(self.directory / f"slot-{n}.lock", os.O_RDWR | os.O_CREAT, 0o600)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                os.close(fd)
+                continue
+            return fd
+        return None
+
+    def acquire(self, deadline: float):
+        while True:
+            fd = self.try_acquire()
+            if fd is not None or time.monotonic() >= deadline:
+                return fd
+            time.sleep(SHARED_POLL_INTERVAL)
+
+    async def aacquire(self, deadline: float):
+        while True:
+            fd = self.try_acquire()
+            if fd is not None or time.monotonic() >= deadline:
+                return fd
+            await asyncio.sleep(SHARED_POLL_INTERVAL)
+
+    def release(self, fd) -> None:
+        os.close(fd)
+
+
+class AdmissionController:
+    def __init__(self, max_concurrency=DEFAULT_MAX_CONCURRENCY, max_queue=DEFAULT_MAX_QUEUE, timeout=DEFAULT_QUEUE_TIMEOUT,
+                 shared: SharedSlots = None):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.timeout = timeout
+        # Caps the LLM calls of all worker processes together; the local queue only orders this one's.
+        self.shared = shared
+        self._cond = threading.Condition()
+        self._active = 0
+        self._waiting = deque()
+        self._avg_hold = 5.0
+
+    @property
+    def depth(self) -> int:
+        return len(self._waiting)
+
+    def retry_after(self) -> int:
+        backlog = len(self._waiting) + 1
+        return max(1, math.ceil(self._avg_hold * backlog / self.max_concurrency))
+
+    def _publish(self) -> None:
+        registry.set_gauge("morph_llm_queue_depth", len(self._waiting))
+        registry.set_gauge("morph_llm_active_requests", self._active)
+
+    def _reject(self, error_class, reason: str, message: str):
+        registry.inc("morph_llm_rejected_total", reason=reason)
+        return error_class(message, self.retry_after())
+
+    def check(self) -> None:
+        with self._cond:
+            if self._active >= self.max_concurrency and len(self._waiting) >= self.max_queue:
+                raise self._reject(QueueFull, "queue_full", "Antrean chat sedang penuh.")
+
+    def _grant(self) -> None:
+        # Slots are handed to waiters here, in FIFO order, so a woken waiter never competes for one.
+        wake_threads = False
+        while self._waiting and self._active < self.max_concurrency:
+            ticket = self._waiting.popleft()
+            self._active += 1
+            ticket.granted = True
+            if ticket.loop is None:
+                wake_threads = True
+                continue
+            try:
+                ticket.loop.call_soon_threadsafe(_resolve, ticket.future)
+            except RuntimeError:
+                # Its event loop has closed; nobody is left to use or release the slot.
+                ticket.granted = False
+                self._active -= 1
+        if wake_threads:
+            self._cond.notify_all()
+
+    def _admit_now(self) -> bool:
+        if self._active < self.max_concurrency and not self._waiting:
+            self._active += 1
+            self._publish()
+            registry.observe("morph_llm_queue_wait_seconds", 0.0)
+            return True
+        if len(self._waiting) >= self.max_queue:
+            raise self._reject(QueueFull, "queue_full", "Antrean chat sedang penuh.")
+        return False
+
+    def _abandon(self, ticket) -> None:
+        if ticket.granted:
+            self._active -= 1
+            self._grant()
+        else:
+            self._waiting.remove(ticket)
+        self._publish()
+
+    def _acquire(self, timeout=None) -> float:
+        start = time.monotonic()
+        deadline = start + (self.timeout if timeout is None else timeout)
+
+        with self._cond:
+            if self._admit_now():
+                return 0.0
+
+            ticket = _Ticket()
+            self._waiting.append(ticket)
+            self._publish()
+            try:
+                while not ticket.granted:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise self._reject(QueueTimeout, "timeout", "Waktu tunggu antrean chat habis.")
+                    self._cond.wait(remaining)
+            except BaseException:
+                self._abandon(ticket)
+                raise
+            self._publish()
+
+        waited = time.monotonic() - start
+        registry.observe("morph_llm_queue_wait_seconds", waited)
+        return waited
+
+    async def _aacquire(self, timeout=None) -> float:
+        # Waits on a future owned by the event loop instead of parking a thread per queued request.
+        start = time.monotonic()
+
+        with self._cond:
+            if self._admit_now():
+                return 0.0
+            ticket = _Ticket(asyncio.get_running_loop())
+            self._waiting.append(ticket)
+            self._publish()
+
+        try:
+            await asyncio.wait_for(ticket.future, self.timeout if timeout is None else timeout)
+        except BaseException as error:
+            with self._cond:
+                self._abandon(ticket)
+            if isinstance(error, asyncio.TimeoutError):
+                raise self._reject(QueueTimeout, "timeout", "Waktu tunggu antrean chat habis.") from None
+            raise
+
+        waited = time.monotonic() - start
+        registry.observe("morph_llm_queue_wait_seconds", waited)
+        return waited
+
+    def _release(self, held=None) -> None:
+        with self._cond:
+            self._active -= 1
+            if held is not None:
+                self._avg_hold += HOLD_TIME_SMOOTHING * (held - self._avg_hold)
+            self._grant()
+            self._publish()
+
+    def _shared_granted(self, lock):
+        if lock is None:
+            self._release()
+            raise self._reject(QueueTimeout, "timeout", "Waktu tunggu antrean chat habis.")
+        return lock
+
+    @contextmanager
+    def slot(self, timeout=None):
+        deadline = time.monotonic() + (self.timeout if timeout is None else timeout)
+        waited = self._acquire(timeout)
+        lock = None
+        if self.shared is not None:
+            lock = self._shared_granted(self.shared.acquire(deadline))
+        start = time.monotonic()
+        try:
+            yield waited
+        finally:
+            if lock is not None:
+                self.shared.release(lock)
+            self._release(time.monotonic() - start)
+
+    @asynccontextmanager
+    async def aslot(self, timeout=None):
+        deadline = time.monotonic() + (self.timeout if timeout is None else timeout)
+        waited = await self._aacquire(timeout)
+        lock = None
+        if self.shared is not None:
+            try:
+                lock = self._shared_granted(await self.shared.aacquire(deadline))
+            except asyncio.CancelledError:
+                self._release()
+                raise
+        start = time.monotonic()
+        try:
+            yield waited
+        finally:
+            if lock is not None:
+                self.shared.release(lock)
+            self._release(time.monotonic() - start)
+
+
+@lazy_singleton
+def get_admission() -> AdmissionController:
+    max_concurrency = getattr(settings, "MORPH_AI_LLM_MAX_CONCURRENCY", DEFAULT_MAX_CONCURRENCY)
+    lock_dir = getattr(settings, "MORPH_AI_LLM_LOCK_DIR", None)
+    return AdmissionController(
+        max_concurrency=max_concurrency,
+        max_queue=getattr(settings, "MORPH_AI_LLM_MAX_QUEUE", DEFAULT_MAX_QUEUE),
+        timeout=getattr(settings, "MORPH_AI_LLM_QUEUE_TIMEOUT", DEFAULT_QUEUE_TIMEOUT),
+        shared=SharedSlots(lock_dir, max_concurrency) if lock_dir and fcntl else None,
+    )
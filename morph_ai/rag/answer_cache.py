@@ -0,0 +1,128 @@
+import hashlib
+import math
+import operator
+import re
+import threading
+import time
+from array import array
+from collections import OrderedDict
+
+from .lexical import TOKEN_PATTERN
+
+__all__ = ["SemanticAnswerCache", "answer_cache", "depends_on_history", "progress_fingerprint"]
+
+SIMILARITY_THRESHOLD = 0.95
+TTL_SECONDS = 60 * 60
+MAX_ENTRIES = 512
+FOLLOW_UP_MAX_TERMS = 3
+FOLLOW_UP_PATTERN = re.compile(
+    r"\b(tadi|tersebut|barusan|sebelumnya|lainnya|lagi|di atas|it|that|again|previous|above)\b"
+)
+
+
+def progress_fingerprint(progress) -> str:
+    digest = hashlib.sha256()
+    for title, page in sorted((e.title.lower(), e.page) for e in progress):
+        digest.update(f"{title}:{page}\n".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def depends_on_history(question: str) -> bool:
+    # Very short or anaphoric questions ("kenapa?", "contoh lainnya", "yang tadi maksudnya apa")
+    # only make sense after the turns before them; their answers must not be shared.
+    lowered = question.lower()
+    return len(TOKEN_PATTERN.findall(lowered)) <= FOLLOW_UP_MAX_TERMS or bool(FOLLOW_UP_PATTERN.search(lowered))
+
+
+def _unit(vector) -> array:
+    norm = math.sqrt(sum(x * x for x in vector))
+    return array("f", (x / norm for x in vector) if norm else vector)
+
+
+def _dot(a, b) -> float:
+    return sum(map(operator.mul, a, b))
+
+
+class _Entry:
+    __slots__ = ("fingerprint", "vector", "answer", "rec", "expires_at")
+
+    def __init__(self, fingerprint, vector, answer, rec, expires_at):
+        self.fingerprint = fingerprint
+        self.vector = vector
+        self.answer = answer
+        self.rec = rec
+        self.expires_at = expires_at
+
+
+class SemanticAnswerCache:
+    def __init__(self, threshold=SIMILARITY_THRESHOLD, ttl=TTL_SECONDS, max_entries=MAX_ENTRIES):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._next_key = 0
+        self._entries: "OrderedDict[int, _Entry]" = OrderedDict()
+        self._by_fingerprint: dict[str, set[int]] = {}
+
+    def _drop(self, key: int) -> None:
+        entry = self._entries.pop(key)
+        keys = self._by_fingerprint[entry.fingerprint]
+        keys.discard(key)
+        if not keys:
+            del self._by_fingerprint[entry.fingerprint]
+
+    def lookup(self, vector, fingerprint: str):
+        query = _unit(vector)
+        now = time.monotonic()
+
+        with self._lock:
+            best_key, best_score = None, self.threshold
+            for key in list(self._by_fingerprint.get(fingerprint, ())):
+                entry = self._entries[key]
+                if entry.expires_at <= now:
+                    self._drop(key)
+                    continue
+                score = _dot(query, entry.vector)
+                if score >= best_score:
+                    best_key, best_score = key, score
+
+            if best_key is None:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            self._entries.move_to_end(best_key)
+            entry = self._entries[best_key]
+            return entry.answer, entry.rec
+
+    def store(self, vector, fingerprint: str, answer: str, rec) -> None:
+        entry = _Entry(fingerprint, _unit(vector), answer, rec, time.monotonic() + self.ttl)
+
+        with self._lock:
+            key = self._next_key
+            self._next_key += 1
+            self._entries[key] = entry
+            self._by_fingerprint.setdefault(fingerprint, set()).add(key)
+
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._by_fingerprint.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._entries),
+                "hit_rate": self.hits / total if total else 0.0,
+            }
+
+
+answer_cache = SemanticAnswerCache()
@@ -1,101 +1,242 @@
-from langchain_ollama import ChatOllama
-from langchain.prompts import PromptTemplate
-from langchain.schema import HumanMessage, AIMessage
-from langchain.chains import LLMChain
-from morph_auth.models import ChatLog  
-from .vector_store import get_retriever, LANGUAGE_MAP
+from .vector_store import current_retriever, get_retriever, get_embedding, use_fake_backend, fake_options
+from .context import CONTEXT_TOKEN_BUDGET, build_prompt_inputs
+from .retrieval import retrieval_scope
 from .prompts import BASE_TEMPLATE
 from .recommender import detect_recommendation
+from .intents import route_intent, rule_intent
+from .answer_cache import answer_cache, depends_on_history, progress_fingerprint
+from .lazy import lazy_singleton
+from .metrics import start_trace
+from .admission import get_admission, Overloaded
+from .chat_writer import chat_turn, get_chat_writer
+from django.conf import settings
 from django.utils import timezone
+from asgiref.sync import sync_to_async
+from contextlib import contextmanager
 import time
-from transformers import AutoTokenizer  
 
-retriever = get_retriever()
-llm = ChatOllama(model="gemma3:4b")
-
-prompt = PromptTemplate(
-    input_variables=["context", "question"],
-    template=BASE_TEMPLATE
-)
-
-llm_chain = LLMChain(llm=llm, prompt=prompt)  
-
-tokenizer = AutoTokenizer.from_pretrained("bert-base-uncased")
-
-def build_context(user, docs) -> str:
-    lesson_ctx, prog_lines = "", []
-
-    progress_qs = user.lesson_progress.all()
-    for e in progress_qs:
-        prog_lines.append(f"- {e.title}, halaman {e.page} (terakhir {e.date})")
-
-    if prog_lines:
-        lesson_ctx += "Riwayat belajar pengguna:\n" + "\n".join(prog_lines) + "\n"
-
-    latest_progress = progress_qs.first()
-    if latest_progress:
-        lesson_ctx += (
-            f"Pelajaran terakhir yang dipelajari: {latest_progress.title}. "
-            f"Pengguna terakhir berada di halaman: {latest_progress.page}. "
-        )
-
-    keywords = ", ".join(LANGUAGE_MAP.values())
-    doc_ctx = "\n\n".join([d.page_content for d in docs])
-
-    return f"{lesson_ctx}\n\nTopik yang diizinkan: {keywords}.\n\n{doc_ctx}"
-
-def run_chat(user, question: str, timestamp=None) -> tuple[str, dict | None]:
-    timestamp = timestamp or timezone.now()
-
-    t_start_total = time.time()
-
-    t_start_retrieval = time.time()
-    docs = retriever.invoke(question)
-    t_end_retrieval = time.time()
-
-    logs = user.chat_logs.order_by('-timestamp')[:10][::-1]
-    chat_hist = []
-    for log in logs:
-        if log.role == "user":
-            chat_hist.append(HumanMessage(content=log.content))
-        elif log.role == "ai":
-            chat_hist.append(AIMessage(content=log.content))
-
-    t_start_context = time.time()
-    context = build_context(user, docs)
-    t_end_context = time.time()
-
-    t_start_llm = time.time()
-    result = llm_chain.invoke({
-        "question": question,
-        "context": context
-    })
-    t_end_llm = time.time()
-
-    response = result.get("text") or result.get("content") or str(result)
-
-    ChatLog.objects.create(user=user, role="user", content=question, timestamp=timestamp)
-    ChatLog.objects.create(user=user, role="ai", content=response, timestamp=timezone.now())
-
-    rec = detect_recommendation(response)
-    rec_data = None
+LLM_MODEL = "gemma3:4b"
+
+@lazy_singleton
+def get_llm():
+    if use_fake_backend():
+        from .fakes import FakeChatModel
+        options = fake_options()
+        options.pop("embed_latency", None)
+        return FakeChatModel(**options)
+
+    from langchain_ollama import ChatOllama
+    return ChatOllama(model=LLM_MODEL)
+
+@lazy_singleton
+def get_llm_chain():
+    from langchain.prompts import PromptTemplate
+
+    prompt = PromptTemplate(
+        input_variables=["context", "history", "question"],
+        template=BASE_TEMPLATE
+    )
+    return prompt | get_llm()
+
+def warmup(ping: bool = False) -> dict:
+    timings = {}
+    for name, loader in (("retriever", get_retriever), ("llm", get_llm_chain)):
+        start = time.perf_counter()
+        loader()
+        timings[name] = time.perf_counter() - start
+
+    if ping:
+        start = time.perf_counter()
+        get_llm().invoke("ping")
+        timings["ping"] = time.perf_counter() - start
+    return timings
+
+def load_progress(user) -> list:
+    return list(user.lesson_progress.all())
+
+HISTORY_MESSAGES = 10
+
+def merge_pending_history(user, rows) -> list:
+    # Turns still queued in the write-behind buffer are part of the conversation already.
+    seen = {message_id for *_, message_id in rows if message_id}
+    pending = [
+        (row.role, row.content, row.timestamp, row.message_id)
+        for row in get_chat_writer().pending_for(user.pk)
+        if row.message_id not in seen
+    ]
+    if pending:
+        rows = sorted(rows + pending, key=lambda row: row[2])[-HISTORY_MESSAGES:]
+    return [(role, content) for role, content, *_ in rows]
+
+def load_chat_history(user) -> list:
+    rows = list(user.chat_logs.order_by('-timestamp').values_list("role", "content", "timestamp", "message_id")[:HISTORY_MESSAGES])
+    return merge_pending_history(user, rows[::-1])
+
+def recommendation_data(rec) -> dict | None:
     if rec and "lesson" in rec:
-        rec_data = {
+        data = {
             "title": rec["lesson"].title
         }
+        page = rec.get("page")
+        if page:
+            data["page"] = {
+                "page": page.page,
+                "title": page.title,
+                "filename": page.filename,
+                "file_url": page.file_url
+            }
+        return data
+    return None
+
+def save_turn(user, question: str, response: str, timestamp) -> None:
+    get_chat_writer().submit(chat_turn(user, question, response, timestamp))
+
+class ChatTurn:
+    # State of one chat request as it moves through the pipeline shared by all four entry points.
+    def __init__(self, user, question: str, timestamp, trace):
+        self.user = user
+        self.question = question
+        self.timestamp = timestamp
+        self.trace = trace
+        self.outcome = "error"
+        self.answer = None
+        self.inputs = None
+        self.cache_key = None
+        self.parts = []
+        self.metadata = {}
+
+@contextmanager
+def traced_turn(name: str, user, question: str, timestamp=None):
+    turn = ChatTurn(user, question, timestamp or timezone.now(), start_trace(name))
+    try:
+        yield turn
+    except Overloaded:
+        turn.outcome = "rejected"
+        raise
+    finally:
+        turn.trace.finish(turn.outcome)
+
+def answer_directly(turn: ChatTurn, answer: tuple, outcome: str) -> ChatTurn:
+    with turn.trace.span("persistence"):
+        save_turn(turn.user, turn.question, answer[0], turn.timestamp)
+    turn.answer, turn.outcome = answer, outcome
+    return turn
+
+def prepare_chat(turn: ChatTurn) -> ChatTurn:
+    # Every stage before the LLM. Sets turn.answer when the request is answered without it,
+    # otherwise turn.inputs for the prompt.
+    trace, user, question = turn.trace, turn.user, turn.question
+
+    with trace.span("progress"):
+        progress = load_progress(user)
+    retriever = current_retriever()
+    # Keyword queries are answered from BM25 alone; unless an intent rule needs confirming,
+    # embedding them would only feed the semantic cache, so that is skipped too.
+    lexical = retriever.is_lexical(question)
+    trace.attrs["lexical"] = lexical
+    with trace.span("intent"):
+        needs_vector = not lexical or rule_intent(question) is not None
+        query_vector = get_embedding().embed_query(question) if needs_vector else None
+        routed = route_intent(question, progress, query_vector)
+    if routed:
+        return answer_directly(turn, routed, "intent")
+
+    with trace.span("history"):
+        history = load_chat_history(user)
+    # Answers are shared between learners at the same progress; follow-ups lean on the
+    # conversation, so those are neither served from nor stored in the cache.
+    if query_vector is not None and not (history and depends_on_history(question)):
+        with trace.span("cache_lookup"):
+            fingerprint = progress_fingerprint(progress)
+            cached = answer_cache.lookup(query_vector, fingerprint)
+        if cached:
+            return answer_directly(turn, cached, "cache_hit")
+        turn.cache_key = (query_vector, fingerprint)
+
+    with trace.span("retrieval"):
+        docs = retriever.invoke(question, scope=retrieval_scope(progress, question))
+    with trace.span("context"):
+        budget = getattr(settings, "MORPH_AI_CONTEXT_TOKEN_BUDGET", CONTEXT_TOKEN_BUDGET)
+        inputs, usage = build_prompt_inputs(question, docs, progress, history, budget=budget)
+    trace.attrs["context_tokens"] = usage
+    turn.inputs = {"question": question, **inputs}
+    return turn
+
+def take_chunk(turn: ChatTurn, chunk) -> str:
+    if chunk.response_metadata:
+        turn.metadata = chunk.response_metadata
+    if chunk.content:
+        if not turn.parts:
+            turn.trace.add("first_token", time.perf_counter() - turn.trace.started)
+        turn.parts.append(chunk.content)
+    return chunk.content
+
+def complete_chat(turn: ChatTurn, response: str, metadata) -> tuple[str, dict | None]:
+    trace = turn.trace
+    trace.record_llm_usage(metadata)
+    with trace.span("persistence"):
+        save_turn(turn.user, turn.question, response, turn.timestamp)
+    with trace.span("recommendation"):
+        rec_data = recommendation_data(detect_recommendation(response))
+    if turn.cache_key:
+        answer_cache.store(*turn.cache_key, response, rec_data)
+    turn.outcome = "ok"
+    return (response, rec_data)
 
-    t_end_total = time.time()
-    num_tokens = len(tokenizer.encode(response))
-    llm_duration = t_end_llm - t_start_llm
-    tokens_per_sec = num_tokens / llm_duration if llm_duration else 0
-
-    print("\n--- PERFORMANCE METRICS ---")
-    print(f"Total time       : {t_end_total - t_start_total:.2f}s")
-    print(f"Retrieval time   : {t_end_retrieval - t_start_retrieval:.2f}s")
-    print(f"Context build    : {t_end_context - t_start_context:.2f}s")
-    print(f"LLM gen time     : {llm_duration:.2f}s")
-    print(f"Tokens generated : {num_tokens}")
-    print(f"Tokens/sec       : {tokens_per_sec:.2f}")
-    print("---------------------------\n")
+# The async entry points run the same stages in a worker thread; only the LLM call is awaited.
+aprepare_chat = sync_to_async(prepare_chat, thread_sensitive=False)
+acomplete_chat = sync_to_async(complete_chat, thread_sensitive=False)
 
-    return (response, rec_data)
+def run_chat(user, question: str, timestamp=None) -> tuple[str, dict | None]:
+    with traced_turn("chat", user, question, timestamp) as turn:
+        if prepare_chat(turn).answer:
+            return turn.answer
+
+        with get_admission().slot() as waited:
+            turn.trace.add("queue", waited)
+            with turn.trace.span("llm"):
+                result = get_llm_chain().invoke(turn.inputs)
+        return complete_chat(turn, result.content, result.response_metadata)
+
+def stream_chat(user, question: str, timestamp=None):
+    with traced_turn("chat_stream", user, question, timestamp) as turn:
+        if prepare_chat(turn).answer:
+            yield ("token", turn.answer[0])
+            yield ("done", turn.answer)
+            return
+
+        with get_admission().slot() as waited:
+            turn.trace.add("queue", waited)
+            llm_start = time.perf_counter()
+            for chunk in get_llm_chain().stream(turn.inputs):
+                if take_chunk(turn, chunk):
+                    yield ("token", chunk.content)
+            turn.trace.add("llm", time.perf_counter() - llm_start)
+        yield ("done", complete_chat(turn, "".join(turn.parts), turn.metadata))
+
+async def arun_chat(user, question: str, timestamp=None) -> tuple[str, dict | None]:
+    with traced_turn("chat_async", user, question, timestamp) as turn:
+        if (await aprepare_chat(turn)).answer:
+            return turn.answer
+
+        async with get_admission().aslot() as waited:
+            turn.trace.add("queue", waited)
+            with turn.trace.span("llm"):
+                result = await get_llm_chain().ainvoke(turn.inputs)
+        return await acomplete_chat(turn, result.content, result.response_metadata)
+
+async def astream_chat(user, question: str, timestamp=None):
+    with traced_turn("chat_async_stream", user, question, timestamp) as turn:
+        if (await aprepare_chat(turn)).answer:
+            yield ("token", turn.answer[0])
+            yield ("done", turn.answer)
+            return
+
+        async with get_admission().aslot() as waited:
+            turn.trace.add("queue", waited)
+            llm_start = time.perf_counter()
+            async for chunk in get_llm_chain().astream(turn.inputs):
+                if take_chunk(turn, chunk):
+                    yield ("token", chunk.content)
+            turn.trace.add("llm", time.perf_counter() - llm_start)
+        yield ("done", await acomplete_chat(turn, "".join(turn.parts), turn.metadata))
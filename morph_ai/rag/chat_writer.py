@@ -0,0 +1,145 @@
+import atexit
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db import DatabaseError, close_old_connections, connection, transaction
+from django.utils import timezone
+
+from morph_auth.models import ChatLog
+from .lazy import lazy_singleton
+from .metrics import registry
+
+__all__ = ["ChatLogWriter", "chat_turn", "get_chat_writer"]
+
+logger = logging.getLogger("morph_ai.chat_writer")
+
+DEFAULT_BATCH_SIZE = 100
+DEFAULT_FLUSH_INTERVAL = 0.5
+DEFAULT_MAX_PENDING = 5000
+MAX_RETRIES = 3
+RETRY_BACKOFF = 0.1
+CLOSE_TIMEOUT = 10.0
+
+
+def chat_turn(user, question: str, response: str, timestamp) -> list:
+    # message_id makes a retried batch idempotent: rows that already landed are skipped.
+    return [
+        ChatLog(user_id=user.pk, role="user", content=question, timestamp=timestamp, message_id=uuid.uuid4().hex),
+        ChatLog(user_id=user.pk, role="ai", content=response, timestamp=timezone.now(), message_id=uuid.uuid4().hex),
+    ]
+
+
+class ChatLogWriter:
+    def __init__(self, enabled=True, batch_size=DEFAULT_BATCH_SIZE, flush_interval=DEFAULT_FLUSH_INTERVAL,
+                 max_pending=DEFAULT_MAX_PENDING):
+        self.enabled = enabled
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._cond = threading.Condition()
+        self._pending: "OrderedDict[str, ChatLog]" = OrderedDict()
+        self._stopping = False
+        self._thread = None
+        if enabled:
+            self._thread = threading.Thread(target=self._run, name="chatlog-writer", daemon=True)
+            self._thread.start()
+
+    @property
+    def depth(self) -> int:
+        return len(self._pending)
+
+    def submit(self, rows: list) -> None:
+        if not self.enabled:
+            self._write(rows)
+            return
+
+        with self._cond:
+            for row in rows:
+                self._pending[row.message_id] = row
+            depth = len(self._pending)
+            if depth >= self.batch_size:
+                self._cond.notify()
+        registry.set_gauge("morph_chatlog_pending", depth)
+        if depth >= self.max_pending:
+            # The writer cannot keep up; let the request pay for the write instead of growing unbounded.
+            registry.inc("morph_chatlog_backpressure_total")
+            self.flush()
+
+    def pending_for(self, user_id) -> list:
+        with self._cond:
+            return [row for row in self._pending.values() if row.user_id == user_id]
+
+    def _next_batch(self) -> list:
+        with self._cond:
+            return list(self._pending.values())[:self.batch_size]
+
+    def _write(self, batch: list) -> None:
+        start = time.perf_counter()
+        for attempt in range(MAX_RETRIES + 1):
+            try:
+                close_old_connections()
+                with transaction.atomic():
+                    ChatLog.objects.bulk_create(batch, ignore_conflicts=True)
+                registry.inc("morph_chatlog_rows_total", len(batch), result="written")
+                break
+            except DatabaseError:
+                if attempt == MAX_RETRIES:
+                    logger.exception("Dropping %d chat log rows after %d attempts", len(batch), attempt + 1)
+                    registry.inc("morph_chatlog_rows_total", len(batch), result="dropped")
+                    break
+                time.sleep(RETRY_BACKOFF * 2 ** attempt)
+        registry.observe("morph_chatlog_flush_seconds", time.perf_counter() - start)
+
+        with self._cond:
+            for row in batch:
+                self._pending.pop(row.message_id, None)
+            depth = len(self._pending)
+        registry.set_gauge("morph_chatlog_pending", depth)
+
+    def _run(self) -> None:
+        try:
+            while True:
+                with self._cond:
+                    if not self._stopping and len(self._pending) < self.batch_size:
+                        self._cond.wait(self.flush_interval)
+                    if self._stopping:
+                        return
+                batch = self._next_batch()
+                if batch:
+                    self._write(batch)
+        except Exception:
+            logger.exception("Chat log writer stopped")
+        finally:
+            connection.close()
+
+    def flush(self) -> None:
+        # Safe to race with the background thread: a row written twice is ignored by message_id.
+        while True:
+            batch = self._next_batch()
+            if not batch:
+                return
+            self._write(batch)
+
+    def close(self) -> None:
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(CLOSE_TIMEOUT)
+        self.flush()
+
+
+@lazy_singleton
+def get_chat_writer() -> ChatLogWriter:
+    writer = ChatLogWriter(
+        enabled=getattr(settings, "MORPH_AI_CHATLOG_WRITE_BEHIND", True),
+        batch_size=getattr(settings, "MORPH_AI_CHATLOG_BATCH_SIZE", DEFAULT_BATCH_SIZE),
+        flush_interval=getattr(settings, "MORPH_AI_CHATLOG_FLUSH_INTERVAL", DEFAULT_FLUSH_INTERVAL),
+        max_pending=getattr(settings, "MORPH_AI_CHATLOG_MAX_PENDING", DEFAULT_MAX_PENDING),
+    )
+    atexit.register(writer.close)
+    return writer
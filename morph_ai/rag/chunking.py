@@ -0,0 +1,79 @@
+import re
+
+__all__ = ["split_markdown", "MAX_CHUNK_CHARS"]
+
+MAX_CHUNK_CHARS = 1200
+HEADING_PATTERN = re.compile(r"^(#{1,6})\s+(.+?)\s*#*\s*$")
+PAGE_PATTERN = re.compile(r"^halaman\s+(\d+)", re.IGNORECASE)
+SLUG_PATTERN = re.compile(r"[^a-z0-9]+")
+
+def _slug(text: str) -> str:
+    return SLUG_PATTERN.sub("-", text.lower()).strip("-")[:48] or "section"
+
+def _sections(text: str):
+    stack, page, lines = [], 0, []
+
+    for line in text.splitlines():
+        match = HEADING_PATTERN.match(line)
+        if match and len(match.group(1)) >= 2:
+            if lines:
+                yield stack[:], page, lines
+            level, heading = len(match.group(1)), match.group(2).strip()
+            stack = [(lvl, h) for lvl, h in stack if lvl < level] + [(level, heading)]
+            page_match = PAGE_PATTERN.match(heading)
+            if page_match:
+                page = int(page_match.group(1))
+            elif level == 2:
+                page = 0
+            lines = [line]
+        else:
+            if match and not stack and not lines:
+                stack = [(1, match.group(2).strip())]
+            lines.append(line)
+
+    if lines:
+        yield stack, page, lines
+
+def _pieces(body: str, max_chars: int) -> list[str]:
+    if len(body) <= max_chars:
+        return [body]
+
+    pieces, current = [], ""
+    for paragraph in re.split(r"\n\s*\n", body):
+        while len(paragraph) > max_chars:
+            if current:
+                pieces.append(current)
+                current = ""
+            cut = paragraph.rfind("\n", 0, max_chars)
+            cut = cut if cut > 0 else max_chars
+            pieces.append(paragraph[:cut])
+            paragraph = paragraph[cut:].lstrip("\n")
+        if current and len(current) + len(paragraph) + 2 > max_chars:
+            pieces.append(current)
+            current = ""
+        current = f"{current}\n\n{paragraph}" if current else paragraph
+    if current:
+        pieces.append(current)
+    return pieces
+
+def split_markdown(text: str, max_chars: int = MAX_CHUNK_CHARS) -> list[dict]:
+    chunks, seen = [], {}
+    for stack, page, lines in _sections(text):
+        body = "\n".join(lines).strip()
+        if not body:
+            continue
+
+        heading = " > ".join(h for _, h in stack)
+        key = f"p{page}:{_slug(stack[-1][1]) if stack else 'intro'}"
+        seen[key] = seen.get(key, 0) + 1
+        if seen[key] > 1:
+            key = f"{key}-{seen[key]}"
+
+        for n, piece in enumerate(_pieces(body, max_chars)):
+            chunks.append({
+                "key": f"{key}:{n}",
+                "content": piece.strip(),
+                "page": page,
+                "heading": heading,
+            })
+    return chunks
@@ -0,0 +1,108 @@
+import math
+import re
+
+from .vector_store import LANGUAGE_MAP
+
+__all__ = ["build_prompt_inputs", "estimate_tokens", "CONTEXT_TOKEN_BUDGET"]
+
+CONTEXT_TOKEN_BUDGET = 1536
+PROGRESS_SHARE = 0.15
+HISTORY_SHARE = 0.30
+MAX_PROGRESS_LINES = 5
+MAX_HISTORY_MESSAGES = 10
+MIN_PARTIAL_CHUNK_TOKENS = 64
+CHARS_PER_TOKEN = 4
+
+TOKEN_PATTERN = re.compile(r"\w+")
+ROLE_LABELS = {"user": "Pengguna", "ai": "Mentor"}
+
+def estimate_tokens(text: str) -> int:
+    # gemma's tokenizer is not available locally; ~4 chars/token is close enough for budgeting.
+    return math.ceil(len(text) / CHARS_PER_TOKEN) if text else 0
+
+def trim_to_tokens(text: str, budget: int) -> str:
+    limit = budget * CHARS_PER_TOKEN
+    if len(text) <= limit:
+        return text
+    cut = text.rfind(" ", 0, limit)
+    return text[:cut if cut > 0 else limit].rstrip() + "…"
+
+def build_progress_section(progress, budget: int) -> str:
+    if not progress:
+        return ""
+
+    lines = [f"- {e.title}, halaman {e.page} (terakhir {e.date})" for e in progress[:MAX_PROGRESS_LINES]]
+    if len(progress) > MAX_PROGRESS_LINES:
+        lines.append(f"- … dan {len(progress) - MAX_PROGRESS_LINES} pelajaran lain")
+
+    latest = progress[0]
+    text = (
+        "Riwayat belajar pengguna:\n" + "\n".join(lines) + "\n"
+        f"Pelajaran terakhir yang dipelajari: {latest.title}. "
+        f"Pengguna terakhir berada di halaman: {latest.page}. "
+    )
+    return trim_to_tokens(text, budget)
+
+def rank_chunks(question: str, docs) -> list:
+    terms = set(TOKEN_PATTERN.findall(question.lower()))
+    seen, ranked = set(), []
+    for rank, doc in enumerate(docs):
+        if doc.page_content in seen:
+            continue
+        seen.add(doc.page_content)
+        words = set(TOKEN_PATTERN.findall(doc.page_content.lower()))
+        overlap = len(terms & words) / len(terms) if terms else 0.0
+        ranked.append((overlap + 0.5 / (1 + rank), doc))
+    ranked.sort(key=lambda item: item[0], reverse=True)
+    return [doc for _, doc in ranked]
+
+def build_doc_section(question: str, docs, budget: int) -> str:
+    parts, remaining = [], budget
+    for doc in rank_chunks(question, docs):
+        cost = estimate_tokens(doc.page_content)
+        if cost <= remaining:
+            parts.append(doc.page_content)
+            remaining -= cost
+        elif remaining >= MIN_PARTIAL_CHUNK_TOKENS:
+            parts.append(trim_to_tokens(doc.page_content, remaining))
+            break
+        else:
+            break
+    return "\n\n".join(parts)
+
+def build_history_section(history, budget: int) -> str:
+    lines, remaining = [], budget
+    per_message = max(budget // 3, 1)
+    for role, content in reversed(history[-MAX_HISTORY_MESSAGES:]):
+        line = f"{ROLE_LABELS.get(role, role)}: {trim_to_tokens(content, per_message)}"
+        cost = estimate_tokens(line)
+        if cost > remaining:
+            break
+        lines.append(line)
+        remaining -= cost
+    return "\n".join(reversed(lines))
+
+def build_prompt_inputs(question: str, docs, progress, history, budget: int = CONTEXT_TOKEN_BUDGET) -> tuple[dict, dict]:
+    topics = f"Topik yang diizinkan: {', '.join(LANGUAGE_MAP.values())}."
+    available = max(budget - estimate_tokens(topics), 0)
+
+    lesson_ctx = build_progress_section(progress, int(available * PROGRESS_SHARE))
+    history_ctx = build_history_section(history, int(available * HISTORY_SHARE))
+
+    used = estimate_tokens(lesson_ctx) + estimate_tokens(history_ctx)
+    doc_ctx = build_doc_section(question, docs, max(available - used, 0))
+
+    usage = {
+        "progress": estimate_tokens(lesson_ctx),
+        "history": estimate_tokens(history_ctx),
+        "documents": estimate_tokens(doc_ctx),
+        "topics": estimate_tokens(topics),
+    }
+    usage["total"] = sum(usage.values())
+    usage["budget"] = budget
+
+    inputs = {
+        "context": f"{lesson_ctx}\n\n{topics}\n\n{doc_ctx}",
+        "history": history_ctx or "(belum ada percakapan sebelumnya)",
+    }
+    return inputs, usage
@@ -0,0 +1,161 @@
+import asyncio
+import hashlib
+import sqlite3
+import threading
+import time
+import unicodedata
+from array import array
+from collections import OrderedDict
+
+from langchain_core.embeddings import Embeddings
+
+__all__ = ["CachedEmbeddings", "SQLiteVectorCache", "normalize_query"]
+
+MEMORY_ENTRIES = 2048
+DISK_ENTRIES = 50_000
+DISK_MAX_AGE = 30 * 24 * 60 * 60
+PRUNE_EVERY = 256
+
+def normalize_query(text: str) -> str:
+    return " ".join(unicodedata.normalize("NFKC", text).casefold().split())
+
+class SQLiteVectorCache:
+    def __init__(self, path, max_entries: int = DISK_ENTRIES, max_age: float = DISK_MAX_AGE):
+        self.path = str(path)
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self._local = threading.local()
+        self._puts = 0
+        self._puts_lock = threading.Lock()
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS query_embeddings ("
+                "key TEXT PRIMARY KEY, vector BLOB NOT NULL, created REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS query_embeddings_created ON query_embeddings (created)")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str):
+        row = self._connection().execute("SELECT vector FROM query_embeddings WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        vector = array("f")
+        vector.frombytes(row[0])
+        return vector.tolist()
+
+    def put(self, key: str, vector) -> None:
+        self._connection().execute(
+            "INSERT OR REPLACE INTO query_embeddings (key, vector, created) VALUES (?, ?, ?)",
+            (key, array("f", vector).tobytes(), time.time()),
+        )
+        with self._puts_lock:
+            self._puts += 1
+            due = self._puts % PRUNE_EVERY == 1
+        if due:
+            self.prune()
+
+    def prune(self) -> int:
+        # Drops rows past max_age, then the oldest rows beyond max_entries; returns how many went.
+        conn = self._connection()
+        removed = conn.execute(
+            "DELETE FROM query_embeddings WHERE created < ?", (time.time() - self.max_age,)
+        ).rowcount
+        removed += conn.execute(
+            "DELETE FROM query_embeddings WHERE key IN ("
+            "SELECT key FROM query_embeddings ORDER BY created DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,),
+        ).rowcount
+        return removed
+
+class CachedEmbeddings(Embeddings):
+    def __init__(self, inner: Embeddings, model: str, store: SQLiteVectorCache, max_entries: int = MEMORY_ENTRIES):
+        self.inner = inner
+        self.model = model
+        self.store = store
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._memory: "OrderedDict[str, list[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _key(self, normalized: str) -> str:
+        return hashlib.sha256(f"{self.model}\0{normalized}".encode("utf-8")).hexdigest()
+
+    def _remember(self, key: str, vector) -> None:
+        with self._lock:
+            self._memory[key] = vector
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    def _recall(self, key: str):
+        with self._lock:
+            vector = self._memory.get(key)
+            if vector is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+            return vector
+
+    def _load(self, key: str):
+        try:
+            vector = self.store.get(key)
+        except sqlite3.Error:
+            vector = None
+        with self._lock:
+            if vector is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        if vector is not None:
+            self._remember(key, vector)
+        return vector
+
+    def _cached(self, key: str):
+        vector = self._recall(key)
+        return vector if vector is not None else self._load(key)
+
+    def _store(self, key: str, vector) -> None:
+        self._remember(key, vector)
+        try:
+            self.store.put(key, vector)
+        except sqlite3.Error:
+            pass
+
+    def embed_query(self, text: str) -> list[float]:
+        normalized = normalize_query(text)
+        key = self._key(normalized)
+        vector = self._cached(key)
+        if vector is None:
+            vector = self.inner.embed_query(normalized)
+            self._store(key, vector)
+        return vector
+
+    async def aembed_query(self, text: str) -> list[float]:
+        normalized = normalize_query(text)
+        key = self._key(normalized)
+        vector = self._recall(key)
+        if vector is None:
+            # The SQLite lookup and write block, so they run off the event loop.
+            loop = asyncio.get_running_loop()
+            vector = await loop.run_in_executor(None, self._load, key)
+            if vector is None:
+                vector = await self.inner.aembed_query(normalized)
+                await loop.run_in_executor(None, self._store, key, vector)
+        return vector
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return self.inner.embed_documents(texts)
+
+    async def aembed_documents(self, texts: list[str]) -> list[list[float]]:
+        return await self.inner.aembed_documents(texts)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "memory_size": len(self._memory)}
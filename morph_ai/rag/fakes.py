@@ -0,0 +1,93 @@
+import hashlib
+import math
+import time
+
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+from .context import CHARS_PER_TOKEN
+from .lexical import tokenize
+
+__all__ = ["FakeEmbeddings", "FakeChatModel"]
+
+# Stand-ins for Ollama so benchmarks and CI run without network or GPU. Output is a pure
+# function of the input; only the simulated latency depends on the configured rates.
+
+class FakeEmbeddings(Embeddings):
+    def __init__(self, size: int = 256, latency: float = 0.0):
+        self.size = size
+        self.latency = latency
+
+    def _vector(self, text: str) -> list[float]:
+        # Hashed bag of words: texts sharing terms stay close, so retrieval still ranks sensibly.
+        vector = [0.0] * self.size
+        for term in tokenize(text):
+            digest = hashlib.blake2b(term.encode("utf-8"), digest_size=8).digest()
+            bucket = int.from_bytes(digest[:4], "little") % self.size
+            vector[bucket] += 1.0 if digest[4] & 1 else -1.0
+        norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+        return [v / norm for v in vector]
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        time.sleep(self.latency)
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text: str) -> list[float]:
+        time.sleep(self.latency)
+        return self._vector(text)
+
+class FakeChatModel(BaseChatModel):
+    latency: float = 0.05
+    prefill_tokens_per_sec: float = 2000.0
+    tokens_per_sec: float = 40.0
+    max_tokens: int = 64
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-ollama"
+
+    def _prompt(self, messages) -> str:
+        return "\n".join(str(message.content) for message in messages)
+
+    def _answer(self, prompt: str) -> list[str]:
+        question = prompt.rsplit("Pertanyaan:", 1)[-1].split("Jawaban:", 1)[0]
+        words = question.split() + prompt.split()
+        start = int(hashlib.blake2b(prompt.encode("utf-8"), digest_size=4).hexdigest(), 16) % max(1, len(words))
+        body = (words[start:] + words)[:self.max_tokens]
+        return ["Saya", "sarankan", "lanjut", "belajar:"] + body
+
+    def _metadata(self, prompt_tokens: int, completion_tokens: int) -> dict:
+        # Same keys (and nanosecond units) that ChatOllama reports, so traces look identical.
+        return {
+            "prompt_eval_count": prompt_tokens,
+            "prompt_eval_duration": int(prompt_tokens / self.prefill_tokens_per_sec * 1e9),
+            "eval_count": completion_tokens,
+            "eval_duration": int(completion_tokens / self.tokens_per_sec * 1e9),
+        }
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        prompt = self._prompt(messages)
+        tokens = self._answer(prompt)
+        prompt_tokens = len(prompt) // CHARS_PER_TOKEN
+        time.sleep(self.latency + prompt_tokens / self.prefill_tokens_per_sec + len(tokens) / self.tokens_per_sec)
+
+        message = AIMessage(content=" ".join(tokens), response_metadata=self._metadata(prompt_tokens, len(tokens)))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        prompt = self._prompt(messages)
+        tokens = self._answer(prompt)
+        prompt_tokens = len(prompt) // CHARS_PER_TOKEN
+        time.sleep(self.latency + prompt_tokens / self.prefill_tokens_per_sec)
+
+        for i, token in enumerate(tokens):
+            time.sleep(1 / self.tokens_per_sec)
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=token if i == 0 else " " + token))
+            if run_manager:
+                run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
+        yield ChatGenerationChunk(message=AIMessageChunk(
+            content="", response_metadata=self._metadata(prompt_tokens, len(tokens))
+        ))
@@ -0,0 +1,192 @@
+import math
+import operator
+import re
+
+from morph_lesson.catalogue import get_catalogue
+from .lazy import lazy_singleton
+from .lexical import TOKEN_PATTERN
+
+__all__ = ["classify_intent", "rule_intent", "route_intent", "get_exemplars"]
+
+NEXT_PAGE = "next_page"
+LESSON_DONE = "lesson_done"
+
+MAX_INTENT_WORDS = 8
+INTENT_SIMILARITY = 0.85
+# A keyword rule only needs the nearest exemplar to agree, so it may be less similar than a pure NN hit.
+RULE_AGREEMENT = 0.5
+
+NEXT_PATTERN = re.compile(
+    r"\b(lanjut(kan)?|berikutnya|selanjutnya|habis ini|setelah ini|next|what'?s next|move on)\b"
+)
+DONE_PATTERN = re.compile(
+    r"\b(sudah|udah|sdh|telah)\s+(paham|mengerti|ngerti|selesai|tamat|beres|bisa)\b"
+    r"|\b(i('ve| have)?\s+(finished|completed|understood)|i understand|done with)\b"
+)
+PAGE_PATTERN = re.compile(r"\bhalaman\s+(\d+)\b")
+# Anything that asks for an explanation is a real question, even if it also says "lanjut".
+QUESTION_PATTERN = re.compile(
+    r"\b(apa itu|apa bedanya|bagaimana|gimana|kenapa|mengapa|jelaskan|contoh|cara|maksud|"
+    r"how|why|explain|example|difference)\b"
+)
+# Reports of trouble ("masih error", "tidak jalan") are help requests even when they say "sudah bisa".
+NEGATIVE_PATTERN = re.compile(
+    r"\b(error|eror|tidak|tak|gak|nggak|belum|masih|tapi|tetapi|gagal|salah|wrong|fail(ed)?|not|but)\b"
+)
+
+EXEMPLARS = {
+    NEXT_PAGE: [
+        "lanjut ke halaman berikutnya",
+        "lanjut",
+        "halaman selanjutnya apa",
+        "terus habis ini belajar apa",
+        "materi berikutnya dong",
+        "what's next",
+        "next page please",
+        "what should I learn next",
+    ],
+    LESSON_DONE: [
+        "saya sudah paham materi ini",
+        "aku udah ngerti",
+        "saya sudah selesai lesson ini",
+        "materinya sudah beres",
+        "I finished this lesson",
+        "I understand this topic now",
+    ],
+}
+
+def _cosine(a, b) -> float:
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(x * x for x in b))
+    return sum(map(operator.mul, a, b)) / norm if norm else 0.0
+
+@lazy_singleton
+def get_exemplars() -> list:
+    from .vector_store import get_embedding
+
+    # embed_query goes through the query-embedding cache, so later processes load these from disk.
+    embedding = get_embedding()
+    return [
+        (intent, embedding.embed_query(text))
+        for intent, texts in EXEMPLARS.items()
+        for text in texts
+    ]
+
+def _nearest(query_vector) -> tuple[str | None, float]:
+    best, best_score = None, -1.0
+    for intent, vector in get_exemplars():
+        score = _cosine(query_vector, vector)
+        if score > best_score:
+            best, best_score = intent, score
+    return best, best_score
+
+def _candidate(lowered: str) -> bool:
+    return (
+        len(TOKEN_PATTERN.findall(lowered)) <= MAX_INTENT_WORDS
+        and not QUESTION_PATTERN.search(lowered)
+        and not NEGATIVE_PATTERN.search(lowered)
+    )
+
+def rule_intent(question: str) -> str | None:
+    lowered = question.lower()
+    if not _candidate(lowered):
+        return None
+    if DONE_PATTERN.search(lowered):
+        return LESSON_DONE
+    if NEXT_PATTERN.search(lowered):
+        return NEXT_PAGE
+    return None
+
+def classify_intent(question: str, query_vector=None) -> str | None:
+    # Needs the query vector: a keyword rule is only trusted when the nearest exemplar agrees.
+    if query_vector is None or not _candidate(question.lower()):
+        return None
+
+    nearest, score = _nearest(query_vector)
+    rule = rule_intent(question)
+    if rule is not None:
+        return rule if nearest == rule and score >= RULE_AGREEMENT else None
+    return nearest if score >= INTENT_SIMILARITY else None
+
+def _mentioned_lesson(question: str, lessons_by_title: dict):
+    words = set(TOKEN_PATTERN.findall(question.lower()))
+    for title, lesson in lessons_by_title.items():
+        if title in words:
+            return lesson
+    return None
+
+def _recommend(lesson: dict, page: dict) -> tuple[str, dict]:
+    text = f"**{lesson['title']} halaman {page['page']} · {page['title']}**"
+    return text, {"title": lesson["title"], "page": page}
+
+def _resume_page(lesson: dict, reached: dict):
+    # First page past the learner's furthest progress in this lesson, or None when it is done.
+    done = reached.get(lesson["title"].lower(), 0)
+    return next((page for page in lesson["pages"] if page["page"] > done), None)
+
+def _next_lesson(catalogue: dict, reached: dict, after: dict | None = None):
+    lessons = catalogue["lessons"]
+    if after in lessons:
+        at = lessons.index(after)
+        lessons = lessons[at + 1:] + lessons[:at]
+    fresh = [lesson for lesson in lessons if lesson["title"].lower() not in reached]
+    for lesson in fresh + lessons:
+        page = _resume_page(lesson, reached)
+        if page is not None:
+            return lesson, page
+    return None, None
+
+def _answer_next_page(progress, catalogue, reached: dict) -> tuple[str, dict | None]:
+    current = catalogue["lessons_by_title"].get(progress[0].title.lower()) if progress else None
+    if current is None:
+        lesson, page = _next_lesson(catalogue, reached)
+        if lesson is None:
+            return "Materi belajar belum tersedia saat ini.", None
+        text, rec = _recommend(lesson, page)
+        return f"Yuk mulai dari {text}. Semangat belajar!", rec
+
+    page = _resume_page(current, {current["title"].lower(): progress[0].page})
+    if page is not None:
+        text, rec = _recommend(current, page)
+        return f"Mantap! Lanjut ke {text}.", rec
+    return _answer_lesson_done(current, catalogue, reached)
+
+def _answer_lesson_done(lesson: dict, catalogue, reached: dict) -> tuple[str, dict | None]:
+    reached = {**reached, lesson["title"].lower(): lesson["pages"][-1]["page"] if lesson["pages"] else 0}
+    following, page = _next_lesson(catalogue, reached, after=lesson)
+    if following is None:
+        return f"Keren, kamu sudah menuntaskan {lesson['title']}! Semua materi yang tersedia sudah kamu pelajari.", None
+    text, rec = _recommend(following, page)
+    return f"Keren, {lesson['title']} sudah kamu kuasai! Saya sarankan mempelajari {text}.", rec
+
+def route_intent(question: str, progress, query_vector=None) -> tuple[str, dict | None] | None:
+    intent = classify_intent(question, query_vector)
+    if intent is None:
+        return None
+
+    catalogue = get_catalogue()
+    reached = {}
+    for entry in progress:
+        reached[entry.title.lower()] = max(entry.page, reached.get(entry.title.lower(), 0))
+
+    lesson = _mentioned_lesson(question, catalogue["lessons_by_title"])
+    page_match = PAGE_PATTERN.search(question.lower())
+    if page_match:
+        if lesson is None and progress:
+            lesson = catalogue["lessons_by_title"].get(progress[0].title.lower())
+        if lesson is not None:
+            number = int(page_match.group(1))
+            if intent == NEXT_PAGE:
+                page = next((p for p in lesson["pages"] if p["page"] == number), None)
+                if page is not None:
+                    text, rec = _recommend(lesson, page)
+                    return f"Siap! Buka {text}.", rec
+            else:
+                page = _resume_page(lesson, {lesson["title"].lower(): number})
+                if page is not None:
+                    text, rec = _recommend(lesson, page)
+                    return f"Mantap! Lanjut ke {text}.", rec
+                return _answer_lesson_done(lesson, catalogue, reached)
+
+    if intent == LESSON_DONE and lesson is not None:
+        return _answer_lesson_done(lesson, catalogue, reached)
+    return _answer_next_page(progress, catalogue, reached)
@@ -0,0 +1,32 @@
+import functools
+import threading
+
+__all__ = ["lazy_singleton"]
+
+
+def lazy_singleton(factory):
+    lock = threading.RLock()
+    instance = None
+    loaded = False
+
+    @functools.wraps(factory)
+    def get():
+        nonlocal instance, loaded
+        if not loaded:
+            with lock:
+                if not loaded:
+                    instance = factory()
+                    loaded = True
+        return instance
+
+    def is_loaded() -> bool:
+        return loaded
+
+    def reset() -> None:
+        nonlocal instance, loaded
+        with lock:
+            instance, loaded = None, False
+
+    get.is_loaded = is_loaded
+    get.reset = reset
+    return get
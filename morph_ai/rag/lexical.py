@@ -0,0 +1,84 @@
+import math
+import re
+from collections import Counter
+
+__all__ = ["BM25Index", "index_text", "is_keyword_query", "tokenize"]
+
+TOKEN_PATTERN = re.compile(r"\w+")
+STOPWORDS = {
+    "yang", "dan", "di", "ke", "dari", "ini", "itu", "untuk", "dengan", "apa", "atau", "saya", "aku",
+    "the", "a", "an", "of", "to", "in", "is", "and", "what", "how",
+}
+
+# Some of these are stopwords too, so they have to be checked before tokenize drops them.
+QUESTION_WORDS = {
+    "apa", "apakah", "bagaimana", "gimana", "kenapa", "mengapa", "kapan", "mana", "siapa", "berapa",
+    "jelaskan", "what", "how", "why", "when", "where", "which", "who", "explain",
+}
+
+def tokenize(text: str) -> list[str]:
+    return [t for t in TOKEN_PATTERN.findall(text.lower()) if t not in STOPWORDS]
+
+def is_keyword_query(text: str) -> bool:
+    return "?" not in text and not QUESTION_WORDS.intersection(TOKEN_PATTERN.findall(text.lower()))
+
+def index_text(doc) -> str:
+    # Language, page and heading path live in metadata; index them so "Dart halaman 4" finds its chunk.
+    meta = doc.metadata
+    fields = [doc.page_content, meta.get("heading", "")]
+    if meta.get("language") not in (None, "Unknown"):
+        fields.append(meta["language"])
+    if meta.get("page"):
+        fields.append(f"halaman {meta['page']}")
+    return "\n".join(fields)
+
+class BM25Index:
+    def __init__(self, docs, k1: float = 1.5, b: float = 0.75):
+        self.docs = list(docs)
+        self.k1 = k1
+        self.b = b
+        self.postings: dict[str, list[tuple[int, int]]] = {}
+        self.doc_lengths = []
+
+        for i, doc in enumerate(self.docs):
+            counts = Counter(tokenize(index_text(doc)))
+            self.doc_lengths.append(sum(counts.values()))
+            for term, tf in counts.items():
+                self.postings.setdefault(term, []).append((i, tf))
+
+        total = len(self.docs)
+        self.avg_length = (sum(self.doc_lengths) / total) if total else 0.0
+        self.idf = {
+            term: math.log(1 + (total - len(postings) + 0.5) / (len(postings) + 0.5))
+            for term, postings in self.postings.items()
+        }
+
+    def knows(self, term: str) -> bool:
+        return term in self.postings
+
+    def scores(self, terms, allowed=None) -> dict[int, float]:
+        scores: dict[int, float] = {}
+        for term in set(terms):
+            idf = self.idf.get(term)
+            if idf is None:
+                continue
+            for i, tf in self.postings[term]:
+                if allowed is not None and i not in allowed:
+                    continue
+                norm = tf + self.k1 * (1 - self.b + self.b * self.doc_lengths[i] / (self.avg_length or 1))
+                scores[i] = scores.get(i, 0.0) + idf * tf * (self.k1 + 1) / norm
+        return scores
+
+    def search(self, query: str, k: int, allowed=None) -> list:
+        scores = self.scores(tokenize(query), allowed)
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+        return [(self.docs[i], score) for i, score in ranked]
+
+    def covers(self, terms, allowed=None) -> bool:
+        docs = None if allowed is None else set(allowed)
+        for term in set(terms):
+            ids = {i for i, _ in self.postings.get(term, ())}
+            docs = ids if docs is None else docs & ids
+            if not docs:
+                return False
+        return bool(docs)
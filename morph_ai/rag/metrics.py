@@ -0,0 +1,214 @@
+import json
+import logging
+import math
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+__all__ = ["registry", "start_trace", "register_sink", "JsonLogSink"]
+
+logger = logging.getLogger("morph_ai.metrics")
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+RESERVOIR_SIZE = 1024
+STAGE_METRIC = "morph_chat_stage_seconds"
+DEFAULT_SINKS = ["morph_ai.rag.metrics.JsonLogSink"]
+
+
+def _label_key(labels: dict) -> tuple:
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(labels: tuple, extra: tuple = ()) -> str:
+    pairs = labels + extra
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in pairs) + "}"
+
+
+class Histogram:
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+        self.recent = deque(maxlen=RESERVOIR_SIZE)
+
+    def observe(self, value: float) -> None:
+        index = bisect_left(self.buckets, value)
+        if index < len(self.counts):
+            self.counts[index] += 1
+        self.count += 1
+        self.sum += value
+        self.recent.append(value)
+
+    def percentile(self, q: float) -> float:
+        if not self.recent:
+            return 0.0
+        ordered = sorted(self.recent)
+        return ordered[min(len(ordered) - 1, max(0, math.ceil(q * len(ordered)) - 1))]
+
+    def snapshot(self) -> dict:
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "p50": self.percentile(0.50),
+            "p95": self.percentile(0.95),
+            "p99": self.percentile(0.99),
+        }
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms: dict[tuple, Histogram] = {}
+        self._counters: dict[tuple, float] = {}
+        self._gauges: dict[tuple, float] = {}
+
+    def observe(self, name: str, value: float, **labels) -> None:
+        key = (name, _label_key(labels))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(value)
+
+    def inc(self, name: str, amount: float = 1, **labels) -> None:
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def set_gauge(self, name: str, value: float, **labels) -> None:
+        with self._lock:
+            self._gauges[(name, _label_key(labels))] = value
+
+    def emit(self, record: dict) -> None:
+        for stage, seconds in record["stages"].items():
+            self.observe(STAGE_METRIC, seconds, stage=stage)
+        self.observe(STAGE_METRIC, record["total"], stage="total")
+        self.inc("morph_chat_requests_total", outcome=record["outcome"])
+        for name in ("prompt_tokens", "completion_tokens"):
+            if name in record:
+                self.inc(f"morph_llm_{name}_total", record[name])
+
+    def summary(self) -> dict:
+        with self._lock:
+            return {
+                "histograms": {
+                    name + _format_labels(labels): h.snapshot()
+                    for (name, labels), h in sorted(self._histograms.items())
+                },
+                "counters": {name + _format_labels(labels): v for (name, labels), v in sorted(self._counters.items())},
+                "gauges": {name + _format_labels(labels): v for (name, labels), v in sorted(self._gauges.items())},
+            }
+
+    def render_prometheus(self) -> str:
+        lines = []
+        with self._lock:
+            typed = set()
+            for (name, labels), h in sorted(self._histograms.items()):
+                if name not in typed:
+                    lines.append(f"# TYPE {name} histogram")
+                    typed.add(name)
+                cumulative = 0
+                for bound, count in zip(h.buckets, h.counts):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{_format_labels(labels, (('le', bound),))} {cumulative}")
+                lines.append(f"{name}_bucket{_format_labels(labels, (('le', '+Inf'),))} {h.count}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {h.sum}")
+                lines.append(f"{name}_count{_format_labels(labels)} {h.count}")
+            for kind, values in (("counter", self._counters), ("gauge", self._gauges)):
+                for (name, labels), value in sorted(values.items()):
+                    if name not in typed:
+                        lines.append(f"# TYPE {name} {kind}")
+                        typed.add(name)
+                    lines.append(f"{name}{_format_labels(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+    def reset(self) -> None:
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+            self._gauges.clear()
+
+
+class JsonLogSink:
+    def emit(self, record: dict) -> None:
+        logger.info(json.dumps(record, default=str))
+
+
+registry = MetricsRegistry()
+_sinks = None
+_sinks_lock = threading.Lock()
+
+
+def get_sinks() -> list:
+    global _sinks
+    if _sinks is None:
+        with _sinks_lock:
+            if _sinks is None:
+                paths = getattr(settings, "MORPH_AI_METRICS_SINKS", DEFAULT_SINKS)
+                _sinks = [registry] + [import_string(path)() for path in paths]
+    return _sinks
+
+
+def register_sink(sink) -> None:
+    get_sinks().append(sink)
+
+
+class Trace:
+    def __init__(self, name: str):
+        self.name = name
+        self.started = time.perf_counter()
+        self.stages: dict[str, float] = {}
+        self.attrs: dict = {}
+
+    @contextmanager
+    def span(self, stage: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(stage, time.perf_counter() - start)
+
+    def add(self, stage: str, seconds: float) -> None:
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def record_llm_usage(self, metadata: dict) -> None:
+        # Ollama reports its own token counts and durations in nanoseconds.
+        if not metadata:
+            return
+        if "prompt_eval_duration" in metadata:
+            self.add("llm_prefill", metadata["prompt_eval_duration"] / 1e9)
+        if "eval_duration" in metadata:
+            self.add("llm_decode", metadata["eval_duration"] / 1e9)
+        if "prompt_eval_count" in metadata:
+            self.attrs["prompt_tokens"] = metadata["prompt_eval_count"]
+        if "eval_count" in metadata:
+            self.attrs["completion_tokens"] = metadata["eval_count"]
+            if metadata.get("eval_duration"):
+                self.attrs["tokens_per_sec"] = metadata["eval_count"] / (metadata["eval_duration"] / 1e9)
+
+    def finish(self, outcome: str = "ok") -> dict:
+        record = {
+            "trace": self.name,
+            "outcome": outcome,
+            "total": time.perf_counter() - self.started,
+            "stages": dict(self.stages),
+            **self.attrs,
+        }
+        for sink in get_sinks():
+            try:
+                sink.emit(record)
+            except Exception:
+                logger.exception("Metrics sink %r failed", sink)
+        return record
+
+
+def start_trace(name: str = "chat") -> Trace:
+    return Trace(name)
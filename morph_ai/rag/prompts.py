@@ -29,6 +29,9 @@ Jangan menyebutkan bahwa jawaban bersumber dari teks konteks di bawah ini.
 
 {{context}}
 
+Percakapan sebelumnya:
+{{history}}
+
 Pertanyaan:
 {{question}}
 
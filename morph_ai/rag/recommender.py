@@ -1,53 +1,118 @@
 import re
-import difflib
-from morph_lesson.models import Lesson
+import threading
+import time
+from morph_lesson.models import Lesson, Page
 
 TRIGGERS = ["pelajari", "lanjut ke", "belajar", "sarankan", "topik berikutnya"]
 
-def _close_enough(needle: str, haystack: str, threshold=0.75) -> bool:
-    return difflib.SequenceMatcher(None, needle.lower(), haystack.lower()).ratio() >= threshold
+LESSON_PAGE_PATTERN = re.compile(r"([a-zA-Z]+)\s+halaman\s+(\d+)\s*[·|:\-]\s*(.+?)(?:\.|\n|$)", re.IGNORECASE)
+PAGE_TOPIC_PATTERN = re.compile(r"halaman\s+(\d+)\s+tentang\s+(.+?)(?:\.|\n|$)", re.IGNORECASE)
+TOKEN_PATTERN = re.compile(r"\w+")
 
-def detect_recommendation(answer: str):
-    ans_lower = answer.lower()
-    matched_lesson = None
+TITLE_MATCH_THRESHOLD = 0.75
+INDEX_TTL_SECONDS = 300
 
-    for lesson in Lesson.objects.all():
-        if lesson.title.lower() in ans_lower and any(trig in ans_lower for trig in TRIGGERS):
-            matched_lesson = lesson
-            break
+def _tokens(text: str) -> set[str]:
+    return set(TOKEN_PATTERN.findall(text.lower()))
 
-    patterns = [
-        r"([a-zA-Z]+)\s+halaman\s+(\d+)\s*[·|:\-]\s*(.+?)(?:\.|\n|$)",  
-        r"halaman\s+(\d+)\s+tentang\s+(.+?)(?:\.|\n|$)",               
-    ]
+class RecommendationIndex:
+    def __init__(self, lessons, pages):
+        self.lessons = [(lesson.title.lower(), lesson) for lesson in lessons]
+        self.lessons_by_title = dict(self.lessons)
+        self.lesson_rank = {lesson.pk: rank for rank, (_, lesson) in enumerate(self.lessons)}
+        self.pages_by_number = {}
+        self.page_tokens = {}
+        self.inverted = {}
 
-    for pattern in patterns:
-        page_match = re.search(pattern, answer, re.IGNORECASE)
-        if page_match:
-            if len(page_match.groups()) == 3:
-                lesson_title = page_match.group(1).strip()
-            elif len(page_match.groups()) == 2 and matched_lesson:
-                lesson_title = matched_lesson.title
-            else:
+        for page in pages:
+            self.pages_by_number[(page.lesson_id, page.page)] = page
+            tokens = _tokens(page.title)
+            if not tokens:
                 continue
+            self.page_tokens[page.pk] = (tokens, page)
+            for token in tokens:
+                self.inverted.setdefault(token, set()).add(page.pk)
+
+    @classmethod
+    def build(cls):
+        return cls(
+            list(Lesson.objects.order_by("pk")),
+            list(Page.objects.select_related("lesson")),
+        )
 
-            for lesson in Lesson.objects.all():
-                if lesson.title.lower() == lesson_title.lower():
+    def best_page(self, answer_tokens: set[str], lesson=None):
+        candidates = set()
+        for token in answer_tokens:
+            candidates |= self.inverted.get(token, set())
+
+        best, best_key = None, None
+        for pk in candidates:
+            tokens, page = self.page_tokens[pk]
+            if lesson is not None and page.lesson_id != lesson.pk:
+                continue
+            score = len(tokens & answer_tokens) / len(tokens)
+            if score < TITLE_MATCH_THRESHOLD:
+                continue
+            # Equal scores go to the earliest lesson and page, not to set iteration order.
+            key = (-score, self.lesson_rank.get(page.lesson_id, len(self.lesson_rank)), page.page)
+            if best_key is None or key < best_key:
+                best, best_key = page, key
+        return best
+
+    def detect(self, answer: str):
+        ans_lower = answer.lower()
+        matched_lesson, matched_page = None, None
+
+        triggered = any(trig in ans_lower for trig in TRIGGERS)
+        if triggered:
+            for title, lesson in self.lessons:
+                if title in ans_lower:
                     matched_lesson = lesson
                     break
+
+        page_match = LESSON_PAGE_PATTERN.search(answer)
+        if page_match:
+            lesson = self.lessons_by_title.get(page_match.group(1).strip().lower())
+            if lesson:
+                matched_lesson = lesson
+                matched_page = self.pages_by_number.get((lesson.pk, int(page_match.group(2))))
+        elif matched_lesson:
+            topic_match = PAGE_TOPIC_PATTERN.search(answer)
+            if topic_match:
+                matched_page = self.pages_by_number.get((matched_lesson.pk, int(topic_match.group(1))))
+
+        # Matching page titles against the whole answer is only safe once it is known to recommend
+        # something; plain explanations share words like "variabel" with many page titles.
+        if matched_page is None and (triggered or matched_lesson):
+            matched_page = self.best_page(_tokens(answer), matched_lesson)
+            if matched_page is not None and matched_lesson is None:
+                matched_lesson = matched_page.lesson
+
         if matched_lesson:
-            break
+            return {"lesson": matched_lesson, "page": matched_page}
 
-    if not matched_lesson:
-        for lesson in Lesson.objects.prefetch_related("pages"):
-            for page in lesson.pages.all():
-                if _close_enough(page.title, answer):
-                    matched_lesson = lesson
-                    break
-            if matched_lesson:
-                break
+        return None
 
-    if matched_lesson:
-        return {"lesson": matched_lesson}
+_index = None
+_index_built_at = 0.0
+_index_lock = threading.Lock()
 
-    return None
+def get_index() -> RecommendationIndex:
+    global _index, _index_built_at
+    index = _index
+    if index is not None and time.monotonic() - _index_built_at < INDEX_TTL_SECONDS:
+        return index
+
+    with _index_lock:
+        if _index is None or time.monotonic() - _index_built_at >= INDEX_TTL_SECONDS:
+            _index = RecommendationIndex.build()
+            _index_built_at = time.monotonic()
+        return _index
+
+def invalidate_index() -> None:
+    global _index
+    with _index_lock:
+        _index = None
+
+def detect_recommendation(answer: str):
+    return get_index().detect(answer)
@@ -0,0 +1,115 @@
+import re
+
+from .lexical import BM25Index, is_keyword_query, tokenize
+from .metrics import registry
+from .vector_store import LANGUAGE_MAP
+
+__all__ = ["HybridRetriever", "retrieval_scope"]
+
+LEXICAL_MAX_TERMS = 4
+RRF_K = 60
+MIN_SCOPED_RESULTS = 3
+# Chroma reports squared L2 distances; for the unit-length vectors nomic-embed-text returns that
+# is 2 - 2 * cosine, so this keeps hits with a cosine similarity of at least 0.5.
+MAX_SCOPED_DISTANCE = 1.0
+PAGE_WINDOW = (-1, 0, 1, 2)
+
+def doc_key(doc):
+    return doc.metadata.get("content_hash") or doc.page_content
+
+def retrieval_scope(progress, question: str):
+    lowered = question.lower()
+    mentioned = {
+        name for key, name in LANGUAGE_MAP.items()
+        if re.search(rf"\b{re.escape(key)}\b", lowered)
+    }
+    if len(mentioned) == 1:
+        return {"language": mentioned.pop()}
+    if mentioned:
+        return None
+
+    if progress:
+        language = LANGUAGE_MAP.get(progress[0].title.lower())
+        if language:
+            return {"language": language, "page": progress[0].page}
+    return None
+
+def scope_filters(scope) -> list:
+    if not scope:
+        return []
+    language = {"language": scope["language"]}
+    if not scope.get("page"):
+        return [language]
+    # Overview sections (page 0) plus the pages around the learner's current one.
+    pages = [0] + [scope["page"] + offset for offset in PAGE_WINDOW if scope["page"] + offset > 0]
+    return [{"$and": [language, {"page": {"$in": pages}}]}, language]
+
+def matches(metadata: dict, where: dict) -> bool:
+    if "$and" in where:
+        return all(matches(metadata, clause) for clause in where["$and"])
+    for field, value in where.items():
+        if isinstance(value, dict) and "$in" in value:
+            if metadata.get(field) not in value["$in"]:
+                return False
+        elif metadata.get(field) != value:
+            return False
+    return True
+
+class HybridRetriever:
+    def __init__(self, store, lexical: BM25Index, k: int = 6, fetch_k: int = 12):
+        self.store = store
+        self.lexical = lexical
+        self.k = k
+        self.fetch_k = fetch_k
+        self._allowed = {}
+
+    def allowed(self, where):
+        if where is None:
+            return None
+        key = repr(where)
+        if key not in self._allowed:
+            self._allowed[key] = {
+                i for i, doc in enumerate(self.lexical.docs)
+                if matches(doc.metadata, where)
+            }
+        return self._allowed[key]
+
+    def is_lexical(self, query: str, where=None) -> bool:
+        if not is_keyword_query(query):
+            return False
+        terms = tokenize(query)
+        return 0 < len(terms) <= LEXICAL_MAX_TERMS and self.lexical.covers(terms, self.allowed(where))
+
+    def fuse(self, *rankings) -> list:
+        scores, docs = {}, {}
+        for ranking in rankings:
+            for rank, doc in enumerate(ranking):
+                key = doc_key(doc)
+                docs.setdefault(key, doc)
+                scores[key] = scores.get(key, 0.0) + 1.0 / (RRF_K + rank + 1)
+        ranked = sorted(scores, key=scores.get, reverse=True)
+        return [docs[key] for key in ranked[:self.k]]
+
+    def lexical_search(self, query: str, k: int, where=None) -> list:
+        return [doc for doc, _ in self.lexical.search(query, k, self.allowed(where))]
+
+    def _search(self, query: str, where) -> list:
+        if self.is_lexical(query, where):
+            return self.lexical_search(query, self.k, where)
+        vector = self.store.max_marginal_relevance_search(query, k=self.k, fetch_k=self.fetch_k, filter=where)
+        return self.fuse(vector, self.lexical_search(query, self.fetch_k, where))
+
+    def covers_scope(self, query: str, where) -> bool:
+        # A scope almost always has enough chunks to fill k; what matters is whether any are relevant.
+        if self.is_lexical(query, where):
+            return True
+        hits = self.store.similarity_search_with_score(query, k=MIN_SCOPED_RESULTS, filter=where)
+        return sum(1 for _, distance in hits if distance <= MAX_SCOPED_DISTANCE) >= MIN_SCOPED_RESULTS
+
+    def invoke(self, query: str, scope=None) -> list:
+        for where in scope_filters(scope):
+            if self.covers_scope(query, where):
+                registry.inc("morph_retrieval_scope_total", result="page" if "$and" in where else "scoped")
+                return self._search(query, where)
+        registry.inc("morph_retrieval_scope_total", result="fallback" if scope else "global")
+        return self._search(query, None)
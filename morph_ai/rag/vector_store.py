@@ -1,11 +1,10 @@
 from pathlib import Path
-import os, re
-from langchain_chroma import Chroma
-from langchain_ollama import OllamaEmbeddings
-from langchain.schema import Document
-from langchain.text_splitter import RecursiveCharacterTextSplitter
+import hashlib, json, os, re, threading, time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from django.conf import settings
+from .lazy import lazy_singleton
 
-__all__ = ["get_retriever", "LANGUAGE_MAP"]
+__all__ = ["current_retriever", "get_retriever", "get_embedding", "get_store", "sync_store", "LANGUAGE_MAP"]
 
 DATA_DIR = Path(__file__).resolve().parent / "data"
 MD_FILES = [f for f in os.listdir(DATA_DIR) if f.endswith(".md")]
@@ -14,9 +13,46 @@ LANGUAGE_MAP = {
     for f in MD_FILES
 }
 
-VDB_DIR = Path(__file__).resolve().parent / "vectordb"
-INDEX_FILE = VDB_DIR / "chroma.sqlite3"
-EMBEDDING = OllamaEmbeddings(model="nomic-embed-text:latest")
+DEFAULT_VDB_DIR = Path(__file__).resolve().parent / "vectordb"
+# Bump when chunk ids or chunk metadata change shape; an index built with another schema is rebuilt.
+INDEX_SCHEMA = 2
+INDEX_MARKER = "index_schema.json"
+EMBEDDING_MODEL = "nomic-embed-text:latest"
+EMBED_BATCH_SIZE = 32
+EMBED_WORKERS = 4
+# How often a process re-reads the index marker for syncs run by another process (sync_vectors).
+INDEX_CHECK_SECONDS = 5
+
+_index_check = {"corpus": None, "check_after": 0.0}
+_index_lock = threading.Lock()
+
+def vectordb_dir() -> Path:
+    return Path(getattr(settings, "MORPH_AI_VECTORDB_DIR", DEFAULT_VDB_DIR))
+
+def use_fake_backend() -> bool:
+    return getattr(settings, "MORPH_AI_BACKEND", "ollama") == "fake"
+
+def fake_options() -> dict:
+    return dict(getattr(settings, "MORPH_AI_FAKE_OPTIONS", {}))
+
+@lazy_singleton
+def get_embedding():
+    from .embedding_cache import DISK_ENTRIES, DISK_MAX_AGE, CachedEmbeddings, SQLiteVectorCache
+
+    if use_fake_backend():
+        from .fakes import FakeEmbeddings
+        inner, model = FakeEmbeddings(latency=fake_options().get("embed_latency", 0.0)), "fake"
+    else:
+        from langchain_ollama import OllamaEmbeddings
+        inner, model = OllamaEmbeddings(model=EMBEDDING_MODEL), EMBEDDING_MODEL
+
+    vectordb_dir().mkdir(parents=True, exist_ok=True)
+    store = SQLiteVectorCache(
+        vectordb_dir() / "query_embeddings.sqlite3",
+        max_entries=getattr(settings, "MORPH_AI_QUERY_CACHE_MAX_ENTRIES", DISK_ENTRIES),
+        max_age=getattr(settings, "MORPH_AI_QUERY_CACHE_MAX_AGE", DISK_MAX_AGE),
+    )
+    return CachedEmbeddings(inner, model, store)
 
 def _detect_language(fname: str) -> str:
     lower = fname.lower()
@@ -30,54 +66,181 @@ def _order_from_fname(fname: str) -> int:
     return int(m.group(1)) if m else 999
 
 def _extract_metadata(text: str, fname: str) -> dict:
-    metadata = {
-        "source": fname,
-        "language": _detect_language(fname),
-        "order": _order_from_fname(fname),
-    }
-
     lines = text.splitlines()
     title = ""
     if lines and lines[0].startswith("#"):
         title = lines[0].replace("#", "").strip()
-    metadata["title"] = title
-
-    halaman_titles = []
-    for line in lines:
-        if line.strip().lower().startswith("## halaman"):
-            halaman_titles.append(line.strip())
 
-    if halaman_titles:
-        metadata["pages"] = str(halaman_titles)
+    return {
+        "source": fname,
+        "language": _detect_language(fname),
+        "order": _order_from_fname(fname),
+        "title": title,
+    }
 
-    return metadata
+def _chunk_hash(chunk) -> str:
+    digest = hashlib.sha256()
+    digest.update(chunk.metadata["source"].encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(chunk.page_content.encode("utf-8"))
+    return digest.hexdigest()
 
-def _build_store() -> None:
-    VDB_DIR.mkdir(parents=True, exist_ok=True)
-    print("[INFO] Building vector store from markdown files…")
+def _load_chunks() -> dict:
+    from langchain.schema import Document
+    from .chunking import split_markdown
 
-    docs = []
+    chunks = {}
 
-    for fname in MD_FILES:
+    for fname in sorted(f for f in os.listdir(DATA_DIR) if f.endswith(".md")):
         path = DATA_DIR / fname
         text = path.read_text(encoding="utf-8")
-
         meta = _extract_metadata(text, fname)
-        docs.append(Document(page_content=text, metadata=meta))
-
-    splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
-    chunks = splitter.split_documents(docs)
 
-    Chroma.from_documents(
-        chunks,
-        embedding=EMBEDDING,
-        persist_directory=str(VDB_DIR)
-    ).persist()
-
-def get_retriever():
-    if not INDEX_FILE.exists():
-        _build_store()
+        for index, section in enumerate(split_markdown(text)):
+            chunk = Document(page_content=section["content"], metadata={
+                **meta,
+                "page": section["page"],
+                "heading": section["heading"],
+                "chunk_index": index,
+            })
+            chunk.metadata["content_hash"] = _chunk_hash(chunk)
+            # Stable per position in the document, so an edited section is upserted in place.
+            chunks[f"{path.stem.lower()}:{section['key']}"] = chunk
+    return chunks
+
+@lazy_singleton
+def get_store():
+    from langchain_chroma import Chroma
+
+    vectordb_dir().mkdir(parents=True, exist_ok=True)
     return Chroma(
-        persist_directory=str(VDB_DIR),
-        embedding_function=EMBEDDING
-    ).as_retriever(search_type="mmr", search_kwargs={"k": 6, "fetch_k": 12})
+        persist_directory=str(vectordb_dir()),
+        embedding_function=get_embedding()
+    )
+
+def _report_progress(done: int, total: int, elapsed: float) -> None:
+    rate = done / elapsed if elapsed else 0.0
+    print(f"[INFO] Embedded {done}/{total} chunks ({rate:.1f} chunks/s)")
+
+def _embed_and_add(store, chunks, ids, batch_size=EMBED_BATCH_SIZE, workers=EMBED_WORKERS, progress=_report_progress) -> float:
+    embedding = get_embedding()
+    total = len(chunks)
+    done = 0
+    start = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = {}
+        for i in range(0, total, batch_size):
+            batch = chunks[i:i + batch_size]
+            future = pool.submit(embedding.embed_documents, [c.page_content for c in batch])
+            futures[future] = (ids[i:i + batch_size], batch)
+
+        for future in as_completed(futures):
+            batch_ids, batch = futures[future]
+            # Chroma.add_documents would embed again; write the vectors we already have.
+            store._collection.upsert(
+                ids=batch_ids,
+                embeddings=future.result(),
+                documents=[c.page_content for c in batch],
+                metadatas=[c.metadata for c in batch],
+            )
+            done += len(batch)
+            if progress:
+                progress(done, total, time.perf_counter() - start)
+
+    return time.perf_counter() - start
+
+def sync_store(dry_run: bool = False, rebuild: bool = False, batch_size: int = EMBED_BATCH_SIZE,
+               workers: int = EMBED_WORKERS, progress=_report_progress) -> dict:
+    store = get_store()
+    wanted = _load_chunks()
+
+    existing = store.get(include=["metadatas"])
+    indexed = set()
+    changed = set()
+    stale = []
+    for chunk_id, meta in zip(existing["ids"], existing["metadatas"]):
+        if rebuild or chunk_id not in wanted:
+            stale.append(chunk_id)
+        elif (meta or {}).get("content_hash") == wanted[chunk_id].metadata["content_hash"]:
+            indexed.add(chunk_id)
+        else:
+            changed.add(chunk_id)
+
+    pending = [chunk_id for chunk_id in wanted if chunk_id not in indexed]
+    stats = {
+        "added": len(pending) - len(changed),
+        "updated": len(changed),
+        "deleted": len(stale),
+        "unchanged": len(indexed),
+    }
+    if dry_run:
+        return stats
+
+    if stale:
+        store.delete(ids=stale)
+    if pending:
+        elapsed = _embed_and_add(
+            store, [wanted[chunk_id] for chunk_id in pending], pending,
+            batch_size=batch_size, workers=workers, progress=progress
+        )
+        stats["embed_seconds"] = elapsed
+        stats["chunks_per_sec"] = len(pending) / elapsed if elapsed else 0.0
+    if pending or stale:
+        get_lexical_index.reset()
+        get_retriever.reset()
+    write_index_marker(wanted)
+    return stats
+
+def read_index_marker() -> dict:
+    try:
+        return json.loads((vectordb_dir() / INDEX_MARKER).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+
+def write_index_marker(chunks: dict) -> None:
+    digest = hashlib.sha256()
+    for chunk_id in sorted(chunks):
+        digest.update(f"{chunk_id}\0{chunks[chunk_id].metadata['content_hash']}\n".encode("utf-8"))
+    marker = {"schema": INDEX_SCHEMA, "corpus": digest.hexdigest()}
+    path = vectordb_dir() / INDEX_MARKER
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(marker), encoding="utf-8")
+    tmp.replace(path)
+
+@lazy_singleton
+def get_lexical_index():
+    from langchain.schema import Document
+    from .lexical import BM25Index
+
+    indexed = get_store().get(include=["documents", "metadatas"])
+    return BM25Index(
+        Document(page_content=text, metadata=meta or {})
+        for text, meta in zip(indexed["documents"], indexed["metadatas"])
+    )
+
+@lazy_singleton
+def get_retriever():
+    from .retrieval import HybridRetriever
+
+    # A missing marker also covers indexes built before chunking by heading (whole-file chunks
+    # with random ids and no page/heading metadata), which the scoped filters cannot match.
+    if read_index_marker().get("schema") != INDEX_SCHEMA:
+        print("[INFO] Building vector store from markdown files…")
+        sync_store(rebuild=True)
+    return HybridRetriever(get_store(), get_lexical_index(), k=6, fetch_k=12)
+
+def current_retriever():
+    # get_retriever keeps a BM25 snapshot of the corpus; drop it once the marker says it changed.
+    retriever = get_retriever()
+    now = time.monotonic()
+    if now >= _index_check["check_after"]:
+        with _index_lock:
+            corpus = read_index_marker().get("corpus")
+            if _index_check["corpus"] is not None and _index_check["corpus"] != corpus:
+                get_lexical_index.reset()
+                get_retriever.reset()
+                retriever = get_retriever()
+            _index_check["corpus"] = corpus
+            _index_check["check_after"] = now + INDEX_CHECK_SECONDS
+    return retriever
@@ -0,0 +1,12 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from morph_lesson.models import Lesson, Page
+from .rag.recommender import invalidate_index
+
+
+@receiver([post_save, post_delete], sender=Lesson)
+@receiver([post_save, post_delete], sender=Page)
+def invalidate_recommendation_index(sender, **kwargs):
+    transaction.on_commit(invalidate_index)
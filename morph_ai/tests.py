@@ -1,3 +1,573 @@
-from django.test import TestCase
+import asyncio
+import json
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from pathlib import Path
+from unittest import mock, skipIf
 
-# Create your tests here.
+from django.db import DatabaseError
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from langchain_core.documents import Document
+from rest_framework.test import APIClient
+
+from morph_ai.rag import chat_service, intents, vector_store
+from morph_ai.rag.admission import get_admission
+from morph_ai.rag.answer_cache import answer_cache, depends_on_history
+from morph_ai.rag import chat_writer
+from morph_ai.rag.chat_writer import ChatLogWriter, chat_turn, get_chat_writer
+from morph_ai.rag import admission as admission_module
+from morph_ai.rag.admission import AdmissionController, QueueFull, QueueTimeout, SharedSlots
+from morph_ai.rag.chunking import split_markdown
+from morph_ai.rag.embedding_cache import CachedEmbeddings, SQLiteVectorCache
+from morph_ai.rag.fakes import FakeEmbeddings
+from morph_ai.rag.lexical import BM25Index
+from morph_ai.rag.retrieval import HybridRetriever
+from morph_ai.views import encode_cursor
+from morph_auth.models import ChatLog, User
+from morph_ai.rag.recommender import RecommendationIndex
+from morph_lesson.models import Lesson, Page
+
+
+class IntentRoutingTests(SimpleTestCase):
+    def setUp(self):
+        self.embedding = FakeEmbeddings()
+        exemplars = [
+            (intent, self.embedding.embed_query(text))
+            for intent, texts in intents.EXEMPLARS.items()
+            for text in texts
+        ]
+        patcher = mock.patch.object(intents, "get_exemplars", return_value=exemplars)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def classify(self, question):
+        return intents.classify_intent(question, self.embedding.embed_query(question))
+
+    def test_navigation_messages_are_routed(self):
+        self.assertEqual(self.classify("lanjut ke halaman berikutnya"), intents.NEXT_PAGE)
+        self.assertEqual(self.classify("saya sudah paham materi ini"), intents.LESSON_DONE)
+        self.assertEqual(self.classify("aku udah ngerti"), intents.LESSON_DONE)
+        for question in ("what's next?", "lanjut?", "apa selanjutnya?"):
+            with self.subTest(question=question):
+                self.assertEqual(intents.rule_intent(question), intents.NEXT_PAGE)
+                self.assertEqual(self.classify(question), intents.NEXT_PAGE)
+
+    def test_help_requests_go_to_the_llm(self):
+        for question in (
+            "saya sudah bisa install python tapi masih error",
+            "kode saya tidak jalan setelah ini",
+            "print tidak muncul, next step?",
+            "jelaskan materi berikutnya",
+        ):
+            with self.subTest(question=question):
+                self.assertIsNone(intents.rule_intent(question))
+                self.assertIsNone(self.classify(question))
+                self.assertIsNone(intents.route_intent(question, [], self.embedding.embed_query(question)))
+
+    def test_rule_needs_the_nearest_exemplar_to_agree(self):
+        self.assertEqual(intents.rule_intent("sudah selesai, lanjut"), intents.LESSON_DONE)
+        with mock.patch.object(intents, "_nearest", return_value=(intents.NEXT_PAGE, 0.9)):
+            self.assertIsNone(self.classify("sudah selesai, lanjut"))
+        with mock.patch.object(intents, "_nearest", return_value=(intents.LESSON_DONE, 0.2)):
+            self.assertIsNone(self.classify("sudah selesai, lanjut"))
+
+    def test_no_vector_means_no_routing(self):
+        self.assertIsNone(intents.classify_intent("lanjut ke halaman berikutnya"))
+
+
+class RecommendationTests(SimpleTestCase):
+    def setUp(self):
+        lessons = [Lesson(pk=pk, title=title) for pk, title in ((1, "Python"), (2, "Javascript"), (3, "Dart"))]
+        pages = [
+            Page(pk=lesson.pk * 10 + 2, lesson=lesson, page=2, title="Variabel dan Tipe Data Dasar")
+            for lesson in reversed(lessons)
+        ]
+        self.index = RecommendationIndex(lessons, pages)
+
+    def test_plain_explanation_is_not_a_recommendation(self):
+        answer = "Variabel menyimpan data. Tipe data dasar termasuk string dan integer."
+        self.assertIsNone(self.index.detect(answer))
+
+    def test_title_match_ties_go_to_the_first_lesson(self):
+        rec = self.index.detect("Saya sarankan kamu belajar variabel dan tipe data dasar dulu.")
+        self.assertEqual(rec["lesson"].title, "Python")
+        self.assertEqual(rec["page"].page, 2)
+
+
+class AdmissionTests(SimpleTestCase):
+    @skipIf(admission_module.fcntl is None, "shared slots need flock()")
+    def test_worker_processes_share_the_concurrency_limit(self):
+        workdir = tempfile.TemporaryDirectory()
+        self.addCleanup(workdir.cleanup)
+        # Each worker process builds its own controller over the same lock directory.
+        workers = [
+            AdmissionController(max_concurrency=1, max_queue=2, timeout=0.1, shared=SharedSlots(workdir.name, 1))
+            for _ in range(2)
+        ]
+
+        with workers[0].slot():
+            with self.assertRaises(QueueTimeout):
+                with workers[1].slot():
+                    pass
+
+            async def main():
+                with self.assertRaises(QueueTimeout):
+                    async with workers[1].aslot():
+                        pass
+
+            asyncio.run(main())
+            self.assertEqual(workers[1]._active, 0)
+
+        with workers[1].slot():
+            pass
+        self.assertEqual([worker._active for worker in workers], [0, 0])
+
+    def test_async_waiters_are_admitted_in_order_without_threads(self):
+        admission = AdmissionController(max_concurrency=1, max_queue=2, timeout=5)
+        order = []
+
+        async def request(name, hold):
+            async with admission.aslot():
+                order.append(name)
+                await asyncio.sleep(hold)
+
+        async def main():
+            first = asyncio.create_task(request("a", 0.05))
+            await asyncio.sleep(0)
+            waiters = [asyncio.create_task(request(name, 0)) for name in ("b", "c")]
+            await asyncio.sleep(0)
+            self.assertEqual(admission.depth, 2)
+            with self.assertRaises(QueueFull):
+                async with admission.aslot():
+                    pass
+            await asyncio.gather(first, *waiters)
+
+        before = threading.active_count()
+        asyncio.run(main())
+        self.assertEqual(order, ["a", "b", "c"])
+        self.assertLessEqual(threading.active_count(), before)
+        self.assertEqual((admission._active, admission.depth), (0, 0))
+
+    def test_timed_out_and_cancelled_waiters_leave_the_queue(self):
+        admission = AdmissionController(max_concurrency=1, max_queue=4, timeout=0.01)
+
+        async def main():
+            async with admission.aslot():
+                with self.assertRaises(QueueTimeout):
+                    async with admission.aslot():
+                        pass
+                waiter = asyncio.create_task(admission.aslot(timeout=5).__aenter__())
+                await asyncio.sleep(0)
+                waiter.cancel()
+                with self.assertRaises(asyncio.CancelledError):
+                    await waiter
+                self.assertEqual(admission.depth, 0)
+
+        asyncio.run(main())
+        self.assertEqual((admission._active, admission.depth), (0, 0))
+
+    def test_sync_waiter_is_woken_by_async_release(self):
+        admission = AdmissionController(max_concurrency=1, max_queue=2, timeout=5)
+        admitted = threading.Event()
+
+        def sync_request():
+            with admission.slot():
+                admitted.set()
+
+        async def main():
+            async with admission.aslot():
+                thread = threading.Thread(target=sync_request)
+                thread.start()
+                while admission.depth == 0:
+                    await asyncio.sleep(0.001)
+                self.assertFalse(admitted.is_set())
+            return thread
+
+        asyncio.run(main()).join(5)
+        self.assertTrue(admitted.is_set())
+        self.assertEqual(admission._active, 0)
+
+
+class ScopedRetrievalTests(SimpleTestCase):
+    def setUp(self):
+        docs = [
+            Document(page_content=f"{language} halaman {page} materi", metadata={"language": language, "page": page})
+            for language in ("python", "dart") for page in (1, 2, 3)
+        ]
+        self.store = mock.Mock()
+        self.store.max_marginal_relevance_search.return_value = docs[:3]
+        self.retriever = HybridRetriever(self.store, BM25Index(docs))
+        self.scope = {"language": "python", "page": 2}
+        self.question = "bagaimana cara membuat class turunan dengan konstruktor"
+
+    def searched_filters(self):
+        return [call.kwargs["filter"] for call in self.store.max_marginal_relevance_search.call_args_list]
+
+    def test_irrelevant_scope_falls_back_to_global_search(self):
+        self.store.similarity_search_with_score.return_value = [(None, 1.6), (None, 1.7), (None, 1.8)]
+        self.retriever.invoke(self.question, scope=self.scope)
+        self.assertEqual(self.searched_filters(), [None])
+
+    def test_relevant_page_window_is_searched(self):
+        self.store.similarity_search_with_score.return_value = [(None, 0.4), (None, 0.5), (None, 0.9)]
+        self.retriever.invoke(self.question, scope=self.scope)
+        self.assertEqual(len(self.searched_filters()), 1)
+        self.assertIn("$and", self.searched_filters()[0])
+
+
+class LexicalQueryTests(SimpleTestCase):
+    def setUp(self):
+        docs = [
+            Document(
+                page_content=f"## Halaman {page}: {topic}\nMateri {topic.lower()}.",
+                metadata={"language": language, "page": page, "heading": f"Belajar {language} > Halaman {page}: {topic}"},
+            )
+            for language in ("Python", "Dart")
+            for page, topic in ((3, "Fungsi"), (4, "Closure"))
+        ]
+        self.retriever = HybridRetriever(mock.Mock(), BM25Index(docs))
+
+    def test_language_and_page_from_metadata_are_searchable(self):
+        self.assertTrue(self.retriever.is_lexical("Dart halaman 4"))
+        doc = self.retriever.lexical_search("Dart halaman 4", 1)[0]
+        self.assertEqual((doc.metadata["language"], doc.metadata["page"]), ("Dart", 4))
+
+    def test_questions_are_not_keyword_lookups(self):
+        for question in ("apa itu fungsi?", "closure itu apa", "fungsi?", "how closure"):
+            with self.subTest(question=question):
+                self.assertFalse(self.retriever.is_lexical(question))
+        self.assertTrue(self.retriever.is_lexical("closure python"))
+
+
+class QueryEmbeddingCacheTests(SimpleTestCase):
+    def setUp(self):
+        workdir = tempfile.TemporaryDirectory()
+        self.addCleanup(workdir.cleanup)
+        self.path = Path(workdir.name) / "query_embeddings.sqlite3"
+
+    def count(self, store):
+        return store._connection().execute("SELECT COUNT(*) FROM query_embeddings").fetchone()[0]
+
+    def test_prune_drops_expired_and_oldest_rows(self):
+        store = SQLiteVectorCache(self.path, max_entries=3, max_age=60)
+        now = time.time()
+        for n in range(5):
+            store.put(f"key-{n}", [float(n)])
+            store._connection().execute("UPDATE query_embeddings SET created = ? WHERE key = ?", (now + n, f"key-{n}"))
+        store._connection().execute("UPDATE query_embeddings SET created = ? WHERE key = 'key-4'", (now - 120,))
+        self.assertEqual(store.prune(), 2)
+        self.assertEqual(self.count(store), 3)
+        self.assertIsNone(store.get("key-4"))
+        self.assertIsNone(store.get("key-0"))
+        self.assertEqual(store.get("key-3"), [3.0])
+
+    def test_async_lookup_uses_the_disk_cache(self):
+        inner = FakeEmbeddings()
+        SQLiteVectorCache(self.path).put(
+            CachedEmbeddings(inner, "fake", None)._key("halo dunia"), [0.5, 0.5],
+        )
+        cached = CachedEmbeddings(inner, "fake", SQLiteVectorCache(self.path))
+        self.assertEqual(asyncio.run(cached.aembed_query("Halo  Dunia")), [0.5, 0.5])
+        self.assertEqual(cached.stats()["hits"], 1)
+
+
+class ChatHistoryCursorTests(TestCase):
+    URL = "/api/ai/history/"
+    client_class = APIClient
+
+    def setUp(self):
+        self.user = User.objects.create_user("cursor@example.invalid", "cursor")
+        start = timezone.now() - timedelta(hours=1)
+        # Two rows share a timestamp so the id tie-breaker is exercised.
+        stamps = [start, start + timedelta(minutes=1), start + timedelta(minutes=1), start + timedelta(minutes=2),
+                  start + timedelta(minutes=3)]
+        self.logs = [
+            ChatLog.objects.create(user=self.user, role="user", content=f"pesan {n}", timestamp=stamp)
+            for n, stamp in enumerate(stamps)
+        ]
+        self.client.force_authenticate(self.user)
+
+    def fetch(self, **params):
+        response = self.client.get(self.URL, params)
+        self.assertEqual(response.status_code, 200)
+        return [row["content"] for row in response.json()], response.headers
+
+    def test_paging_back_through_history(self):
+        contents, headers = self.fetch(limit=2)
+        self.assertEqual(contents, ["pesan 4", "pesan 3"])
+        self.assertEqual(headers["X-Prev-Cursor"], encode_cursor(self.logs[4].timestamp, self.logs[4].pk))
+
+        contents, headers = self.fetch(limit=2, before=headers["X-Next-Cursor"])
+        self.assertEqual(contents, ["pesan 2", "pesan 1"])
+
+        contents, headers = self.fetch(limit=2, before=headers["X-Next-Cursor"])
+        self.assertEqual(contents, ["pesan 0"])
+        self.assertNotIn("X-Next-Cursor", headers)
+
+    def test_polling_forward_for_new_rows(self):
+        since = encode_cursor(self.logs[0].timestamp, self.logs[0].pk)
+        contents, headers = self.fetch(limit=2, since=since)
+        self.assertEqual(contents, ["pesan 2", "pesan 1"])
+        self.assertEqual(headers["X-Prev-Cursor"], encode_cursor(self.logs[1].timestamp, self.logs[1].pk))
+
+        contents, headers = self.fetch(limit=2, since=headers["X-Next-Cursor"])
+        self.assertEqual(contents, ["pesan 4", "pesan 3"])
+
+        contents, headers = self.fetch(limit=2, since=headers["X-Next-Cursor"])
+        self.assertEqual(contents, [])
+        self.assertNotIn("X-Next-Cursor", headers)
+
+    def test_window_between_two_cursors(self):
+        contents, _ = self.fetch(
+            before=encode_cursor(self.logs[4].timestamp, self.logs[4].pk),
+            since=encode_cursor(self.logs[0].timestamp, self.logs[0].pk),
+        )
+        self.assertEqual(contents, ["pesan 3", "pesan 2", "pesan 1"])
+
+    def test_invalid_cursor_or_limit_is_rejected(self):
+        for params in ({"before": "bm90LWEtY3Vyc29y"}, {"since": "%%%"}, {"before": "MjAyNHxhYmM"}, {"limit": 0},
+                       {"limit": "abc"}):
+            with self.subTest(params=params):
+                self.assertEqual(self.client.get(self.URL, params).status_code, 400)
+
+
+class MarkdownChunkingTests(SimpleTestCase):
+    DATA_DIR = Path(__file__).resolve().parent / "rag" / "data"
+    LESSON = (
+        "# Rangkuman Belajar\n\nPengantar.\n\n"
+        "## Halaman 1: Sintaks\n\nIsi satu.\n\n"
+        "### Contoh\n\nprint(1)\n\n"
+        "## Halaman 2: Variabel\n\nIsi dua.\n\n"
+        "## Catatan\n\nPenutup.\n"
+    )
+
+    def keys(self, text, **kwargs):
+        return [chunk["key"] for chunk in split_markdown(text, **kwargs)]
+
+    def test_pages_follow_halaman_headings(self):
+        chunks = split_markdown(self.LESSON)
+        self.assertEqual(
+            [(chunk["key"], chunk["page"]) for chunk in chunks],
+            [
+                ("p0:rangkuman-belajar:0", 0),
+                ("p1:halaman-1-sintaks:0", 1),
+                ("p1:contoh:0", 1),
+                ("p2:halaman-2-variabel:0", 2),
+                ("p0:catatan:0", 0),
+            ],
+        )
+        self.assertEqual(chunks[2]["heading"], "Rangkuman Belajar > Halaman 1: Sintaks > Contoh")
+
+    def test_repeated_headings_get_distinct_keys(self):
+        text = "## Contoh\n\nsatu\n\n## Contoh\n\ndua\n\n## Contoh\n\ntiga\n"
+        self.assertEqual(self.keys(text), ["p0:contoh:0", "p0:contoh-2:0", "p0:contoh-3:0"])
+
+    def test_oversized_sections_are_split_on_paragraphs(self):
+        paragraphs = [f"Paragraf {n} " + "kata " * 30 for n in range(6)]
+        text = "## Halaman 3: Panjang\n\n" + "\n\n".join(paragraphs) + "\n\n" + "x" * 450
+        chunks = split_markdown(text, max_chars=400)
+
+        self.assertGreater(len(chunks), 2)
+        self.assertEqual([chunk["key"] for chunk in chunks], [f"p3:halaman-3-panjang:{n}" for n in range(len(chunks))])
+        self.assertTrue(all(len(chunk["content"]) <= 400 for chunk in chunks))
+        self.assertTrue(all(chunk["page"] == 3 for chunk in chunks))
+        for paragraph in paragraphs:
+            self.assertTrue(any(paragraph.strip() in chunk["content"] for chunk in chunks))
+
+    def test_keys_survive_edits_and_inserted_sections(self):
+        before = {chunk["key"]: chunk["content"] for chunk in split_markdown(self.LESSON)}
+
+        edited = self.LESSON.replace("Isi dua.", "Isi dua yang sudah diperbarui.")
+        inserted = self.LESSON.replace(
+            "## Halaman 2: Variabel", "## Halaman 1b: Tambahan\n\nMateri baru.\n\n## Halaman 2: Variabel",
+        )
+        self.assertEqual(self.keys(edited), list(before))
+
+        after = {chunk["key"]: chunk["content"] for chunk in split_markdown(inserted)}
+        self.assertEqual(set(after) - set(before), {"p1:halaman-1b-tambahan:0"})
+        self.assertEqual({key: after[key] for key in before}, before)
+
+    def test_bundled_lessons(self):
+        for path in sorted(self.DATA_DIR.glob("*.md")):
+            with self.subTest(lesson=path.name):
+                chunks = split_markdown(path.read_text(encoding="utf-8"))
+                keys = [chunk["key"] for chunk in chunks]
+                self.assertEqual(len(keys), len(set(keys)))
+                self.assertEqual([chunk["page"] for chunk in chunks], [0, 0] + list(range(1, 11)))
+
+                for chunk in chunks[2:]:
+                    # Each lesson orders its topics differently; pages come from the heading, not position.
+                    self.assertTrue(chunk["content"].startswith(f"## Halaman {chunk['page']}:"))
+                    self.assertTrue(chunk["key"].startswith(f"p{chunk['page']}:halaman-{chunk['page']}-"))
+                    self.assertTrue(chunk["heading"].startswith("Rangkuman Materi Belajar"))
+
+
+class VectorIndexSchemaTests(SimpleTestCase):
+    SINGLETONS = [vector_store.get_embedding, vector_store.get_store, vector_store.get_lexical_index,
+                  vector_store.get_retriever]
+
+    def setUp(self):
+        workdir = tempfile.TemporaryDirectory()
+        self.addCleanup(workdir.cleanup)
+        self.vectordb = Path(workdir.name)
+        settings = override_settings(
+            MORPH_AI_BACKEND="fake", MORPH_AI_FAKE_OPTIONS={}, MORPH_AI_VECTORDB_DIR=str(self.vectordb),
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.reset()
+        self.addCleanup(self.reset)
+
+    def reset(self):
+        for loader in self.SINGLETONS:
+            loader.reset()
+        vector_store._index_check.update(corpus=None, check_after=0.0)
+
+    def test_index_without_marker_is_rebuilt(self):
+        # Shape of the originally committed index: whole-file chunks under random ids.
+        vector_store.get_store().add_texts(["seluruh isi python.md"], metadatas=[{"source": "python.md"}], ids=["legacy"])
+        self.reset()
+
+        with mock.patch("builtins.print"):
+            vector_store.get_retriever()
+        indexed = vector_store.get_store().get(include=["metadatas"])
+        self.assertNotIn("legacy", indexed["ids"])
+        self.assertTrue(all("page" in meta and "heading" in meta for meta in indexed["metadatas"]))
+        self.assertEqual(vector_store.read_index_marker()["schema"], vector_store.INDEX_SCHEMA)
+
+    def test_sync_in_another_process_refreshes_the_lexical_index(self):
+        with mock.patch("builtins.print"):
+            retriever = vector_store.current_retriever()
+        self.assertIs(vector_store.current_retriever(), retriever)
+
+        # What sync_vectors leaves behind after re-indexing from another process.
+        marker = {**vector_store.read_index_marker(), "corpus": "re-indexed elsewhere"}
+        (self.vectordb / vector_store.INDEX_MARKER).write_text(json.dumps(marker), encoding="utf-8")
+        vector_store._index_check["check_after"] = 0.0
+        self.assertIsNot(vector_store.current_retriever(), retriever)
+
+
+class FakeBackendMixin:
+    # Runs the real chat pipeline against the deterministic fakes and a throwaway vector store.
+    SINGLETONS = [
+        vector_store.get_embedding, vector_store.get_store, vector_store.get_lexical_index,
+        vector_store.get_retriever, chat_service.get_llm, chat_service.get_llm_chain, intents.get_exemplars,
+        get_chat_writer, get_admission,
+    ]
+
+    def use_fake_backend(self):
+        workdir = tempfile.TemporaryDirectory()
+        self.addCleanup(workdir.cleanup)
+        settings = override_settings(
+            MORPH_AI_BACKEND="fake",
+            MORPH_AI_FAKE_OPTIONS={"latency": 0, "prefill_tokens_per_sec": 1e9, "tokens_per_sec": 1e9},
+            MORPH_AI_VECTORDB_DIR=workdir.name,
+            MORPH_AI_LLM_LOCK_DIR=str(Path(workdir.name) / "llm"),
+            MORPH_AI_METRICS_SINKS=[],
+            MORPH_AI_CHATLOG_WRITE_BEHIND=False,
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.reset_singletons()
+        self.addCleanup(self.reset_singletons)
+        answer_cache.clear()
+        self.addCleanup(answer_cache.clear)
+        vector_store.sync_store(progress=None)
+
+    def reset_singletons(self):
+        for loader in self.SINGLETONS:
+            loader.reset()
+
+
+class ChatLogWriterTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("writer@example.invalid", "writer")
+        # Large batch and interval: the background thread stays idle and the test flushes by hand.
+        self.writer = ChatLogWriter(enabled=True, batch_size=100, flush_interval=60)
+        self.addCleanup(self.writer.close)
+
+    def test_rows_are_buffered_until_flushed(self):
+        rows = chat_turn(self.user, "apa itu list?", "List adalah ...", timezone.now())
+        self.writer.submit(rows)
+        self.assertEqual(ChatLog.objects.count(), 0)
+        self.assertEqual(self.writer.pending_for(self.user.pk), rows)
+
+        self.writer.flush()
+        self.assertEqual(list(ChatLog.objects.values_list("role", flat=True).order_by("id")), ["user", "ai"])
+        self.assertEqual((self.writer.depth, self.writer.pending_for(self.user.pk)), (0, []))
+
+    def test_retries_do_not_duplicate_rows(self):
+        rows = chat_turn(self.user, "apa itu dict?", "Dict adalah ...", timezone.now())
+        bulk_create = ChatLog.objects.bulk_create
+        attempts = []
+
+        def flaky(*args, **kwargs):
+            # The first attempt fails outright; the retry lands.
+            attempts.append(kwargs)
+            if len(attempts) == 1:
+                raise DatabaseError("database is locked")
+            return bulk_create(*args, **kwargs)
+
+        self.writer.submit(rows)
+        with mock.patch.object(ChatLog.objects, "bulk_create", flaky), mock.patch.object(chat_writer, "RETRY_BACKOFF", 0):
+            self.writer.flush()
+        self.assertEqual((len(attempts), ChatLog.objects.count()), (2, 2))
+
+        # The same rows again, e.g. flush() racing the background thread over one batch.
+        self.writer.submit(rows)
+        self.writer.flush()
+        self.assertEqual(ChatLog.objects.count(), 2)
+
+
+class ContextBudgetTests(FakeBackendMixin, TestCase):
+    def test_prompt_budget_comes_from_settings(self):
+        self.use_fake_backend()
+        user = User.objects.create_user("budget@example.invalid", "budget")
+        build = mock.patch.object(chat_service, "build_prompt_inputs", wraps=chat_service.build_prompt_inputs)
+
+        with override_settings(MORPH_AI_CONTEXT_TOKEN_BUDGET=256), build as spy:
+            chat_service.run_chat(user, "jelaskan perbedaan list dan tuple pada python")
+
+        self.assertEqual(spy.call_args.kwargs["budget"], 256)
+        _, usage = chat_service.build_prompt_inputs(*spy.call_args.args, **spy.call_args.kwargs)
+        self.assertLessEqual(usage["total"], 256)
+
+
+class AnswerCacheTests(FakeBackendMixin, TestCase):
+    QUESTIONS = [
+        "bagaimana cara membuat fungsi dengan parameter default",
+        "jelaskan perbedaan list dan tuple pada python",
+        "kapan sebaiknya memakai perulangan while dibanding for",
+    ]
+
+    def setUp(self):
+        self.use_fake_backend()
+        self.alice = User.objects.create_user("alice@example.invalid", "alice")
+        self.bob = User.objects.create_user("bob@example.invalid", "bob")
+        self.before = answer_cache.stats()
+
+    def lookups(self):
+        stats = answer_cache.stats()
+        return stats["hits"] - self.before["hits"], stats["misses"] - self.before["misses"], stats["size"]
+
+    def test_repeated_questions_hit_across_turns_and_users(self):
+        for user in (self.alice, self.bob, self.alice):
+            for question in self.QUESTIONS:
+                chat_service.run_chat(user, question)
+
+        self.assertEqual(self.lookups(), (6, 3, 3))
+        self.assertEqual(ChatLog.objects.filter(user=self.alice).count(), 12)
+
+    def test_follow_ups_bypass_the_cache(self):
+        self.assertTrue(depends_on_history("kenapa?"))
+        self.assertTrue(depends_on_history("berikan contoh lainnya untuk fungsi tersebut"))
+        self.assertFalse(depends_on_history(self.QUESTIONS[0]))
+
+        chat_service.run_chat(self.alice, self.QUESTIONS[0])
+        for user in (self.alice, self.bob):
+            chat_service.run_chat(user, "berikan contoh lainnya untuk fungsi tersebut")
+        # Bob has no history yet, so his copy of the follow-up is a normal (missed) lookup.
+        self.assertEqual(self.lookups(), (0, 2, 2))
@@ -1,7 +1,10 @@
 from django.urls import path
-from .views import ChatView, UserChatLogView
+from django.views.decorators.csrf import csrf_exempt
+from .views import ChatView, AsyncChatView, UserChatLogView, MetricsView
 
 urlpatterns = [
     path("chat/", ChatView.as_view()),
-    path("history/", UserChatLogView.as_view())
+    path("chat/async/", csrf_exempt(AsyncChatView.as_view())),
+    path("history/", UserChatLogView.as_view()),
+    path("metrics/", MetricsView.as_view()),
 ]
@@ -1,11 +1,80 @@
+import base64
+import json
+
+from asgiref.sync import sync_to_async
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from rest_framework import status
+from rest_framework.exceptions import APIException, ValidationError
+from rest_framework.settings import api_settings
+from rest_framework.utils.encoders import JSONEncoder
+from django.db.models import Q
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.views import View
 
 from .serializers import ChatSerializer
-from morph_ai.rag.chat_service import run_chat
+from morph_ai.rag.chat_service import run_chat, stream_chat, arun_chat, astream_chat
+from morph_ai.rag.answer_cache import answer_cache
+from morph_ai.rag.admission import get_admission, Overloaded
+from morph_ai.rag.chat_writer import get_chat_writer
+from morph_ai.rag.metrics import registry
+from morph_ai.rag.vector_store import get_embedding
+
+
+def sse_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+def chat_payload(answer, rec) -> dict:
+    response = {
+        "role": "ai",
+        "content": answer
+    }
+    if rec:
+        response["recommended_lesson"] = rec
+    return response
+
+
+def chat_event(kind, payload) -> str:
+    if kind == "token":
+        return sse_event("token", {"role": "ai", "content": payload})
+    return sse_event("done", chat_payload(*payload))
+
+
+def error_event(e) -> str:
+    if isinstance(e, Overloaded):
+        return sse_event("error", {"role": "system", "content": str(e), "retry_after": e.retry_after})
+    return sse_event("error", {"role": "system", "content": f"Terjadi kesalahan internal: {str(e)}"})
+
+
+def overloaded_payload(e) -> dict:
+    return {"role": "system", "content": str(e), "retry_after": e.retry_after}
+
+
+def stream_chat_events(user, question, timestamp):
+    try:
+        for kind, payload in stream_chat(user, question, timestamp=timestamp):
+            yield chat_event(kind, payload)
+    except Exception as e:
+        yield error_event(e)
+
+
+async def astream_chat_events(user, question, timestamp):
+    try:
+        async for kind, payload in astream_chat(user, question, timestamp=timestamp):
+            yield chat_event(kind, payload)
+    except Exception as e:
+        yield error_event(e)
+
+
+def event_stream_response(events) -> StreamingHttpResponse:
+    response = StreamingHttpResponse(events, content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
 
 
 class ChatView(APIView):
@@ -26,34 +95,181 @@ class ChatView(APIView):
             )
 
         try:
+            if request.query_params.get("stream") in ("1", "true"):
+                get_admission().check()
+                return event_stream_response(stream_chat_events(request.user, question, timestamp))
+
             answer, rec = run_chat(request.user, question, timestamp=timestamp)
+        except Overloaded as e:
+            return Response(
+                overloaded_payload(e),
+                status=status.HTTP_503_SERVICE_UNAVAILABLE,
+                headers={"Retry-After": str(e.retry_after)}
+            )
         except Exception as e:
             return Response(
                 {"role": "system", "content": f"Terjadi kesalahan internal: {str(e)}"},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
-        response = {
-            "role": "ai",
-            "content": answer
-        }
+        return Response(chat_payload(answer, rec))
+
 
-        if rec:
-            response["recommended_lesson"] = rec  
-        return Response(response)
+def authenticate_request(request):
+    for auth_class in api_settings.DEFAULT_AUTHENTICATION_CLASSES:
+        result = auth_class().authenticate(request)
+        if result is not None:
+            return result[0]
+    return None
+
+
+class AsyncChatView(View):
+    async def post(self, request):
+        try:
+            user = await sync_to_async(authenticate_request)(request)
+        except APIException as e:
+            return JsonResponse({"detail": str(e.detail)}, status=e.status_code)
+        if user is None:
+            return JsonResponse(
+                {"detail": "Authentication credentials were not provided."},
+                status=status.HTTP_401_UNAUTHORIZED
+            )
+
+        try:
+            data = json.loads(request.body or b"{}")
+        except ValueError:
+            return JsonResponse({"error": "Body harus berupa JSON."}, status=status.HTTP_400_BAD_REQUEST)
+
+        ser = ChatSerializer(data=data)
+        try:
+            ser.is_valid(raise_exception=True)
+        except ValidationError as e:
+            return JsonResponse(e.detail, status=status.HTTP_400_BAD_REQUEST)
+
+        question = ser.validated_data["content"]
+        timestamp = ser.validated_data.get("timestamp", timezone.now())
+
+        try:
+            if request.GET.get("stream") in ("1", "true"):
+                get_admission().check()
+                return event_stream_response(astream_chat_events(user, question, timestamp))
+
+            answer, rec = await arun_chat(user, question, timestamp=timestamp)
+        except Overloaded as e:
+            response = JsonResponse(overloaded_payload(e), status=status.HTTP_503_SERVICE_UNAVAILABLE)
+            response["Retry-After"] = str(e.retry_after)
+            return response
+        except Exception as e:
+            return JsonResponse(
+                {"role": "system", "content": f"Terjadi kesalahan internal: {str(e)}"},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+        return JsonResponse(chat_payload(answer, rec))
+
+
+HISTORY_PAGE_SIZE = 50
+HISTORY_MAX_PAGE_SIZE = 200
+HISTORY_EXPORT_CHUNK = 500
+
+
+def encode_cursor(timestamp, pk) -> str:
+    raw = f"{timestamp.isoformat()}|{pk}".encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str):
+    padded = cursor + "=" * (-len(cursor) % 4)
+    raw = base64.urlsafe_b64decode(padded.encode("ascii")).decode("utf-8")
+    stamp, pk = raw.rsplit("|", 1)
+    timestamp = parse_datetime(stamp)
+    if timestamp is None:
+        raise ValueError(stamp)
+    return timestamp, int(pk)
+
+
+def export_chat_logs(logs):
+    encoder = JSONEncoder()
+    yield "["
+    for i, (role, content, timestamp) in enumerate(logs.values_list("role", "content", "timestamp").iterator(chunk_size=HISTORY_EXPORT_CHUNK)):
+        prefix = "," if i else ""
+        yield prefix + encoder.encode({"role": role, "content": content, "timestamp": timestamp})
+    yield "]"
 
 
 class UserChatLogView(APIView):
+    # The body is always newest first. ?before= pages back into older history (the default when no
+    # cursor is given); ?since= alone polls forward for newer rows, oldest unseen batch first.
+    # X-Next-Cursor continues in the request's direction and is only sent when the batch was full:
+    # the oldest row (pass as ?before=) when paging back, the newest row (pass as ?since=) when polling.
+    # X-Prev-Cursor is the other end of the batch: the newest row (as ?since=) when paging back, the
+    # oldest row (as ?before=) when polling.
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        logs = request.user.chat_logs.order_by('-timestamp')
+        logs = request.user.chat_logs.order_by('-timestamp', '-id')
+
+        if request.query_params.get("export") in ("1", "true"):
+            response = StreamingHttpResponse(export_chat_logs(logs), content_type="application/json")
+            response["Content-Disposition"] = 'attachment; filename="chat_history.json"'
+            return response
+
+        try:
+            limit = min(int(request.query_params.get("limit", HISTORY_PAGE_SIZE)), HISTORY_MAX_PAGE_SIZE)
+            before = request.query_params.get("before")
+            since = request.query_params.get("since")
+            before = decode_cursor(before) if before else None
+            since = decode_cursor(since) if since else None
+        except ValueError:
+            return Response({"error": "Parameter 'limit' atau cursor tidak valid."}, status=status.HTTP_400_BAD_REQUEST)
+        if limit < 1:
+            return Response({"error": "Parameter 'limit' atau cursor tidak valid."}, status=status.HTTP_400_BAD_REQUEST)
+
+        if before:
+            ts, pk = before
+            logs = logs.filter(Q(timestamp__lt=ts) | Q(timestamp=ts, id__lt=pk))
+        if since:
+            ts, pk = since
+            logs = logs.filter(Q(timestamp__gt=ts) | Q(timestamp=ts, id__gt=pk))
+            if not before:
+                # Oldest unseen rows first so polling never skips a gap, newest-first in the body.
+                logs = logs.order_by('timestamp', 'id')
+
+        rows = list(logs.values("id", "role", "content", "timestamp")[:limit])
+        if since and not before:
+            rows.reverse()
+
         data = [
             {
-                "role": log.role,
-                "content": log.content,
-                "timestamp": log.timestamp
+                "role": row["role"],
+                "content": row["content"],
+                "timestamp": row["timestamp"]
             }
-            for log in logs
+            for row in rows
         ]
-        return Response(data, status=status.HTTP_200_OK)
+        response = Response(data, status=status.HTTP_200_OK)
+        if rows:
+            newest, oldest = rows[0], rows[-1]
+            ahead, behind = (newest, oldest) if since and not before else (oldest, newest)
+            response["X-Prev-Cursor"] = encode_cursor(behind["timestamp"], behind["id"])
+            if len(rows) == limit:
+                response["X-Next-Cursor"] = encode_cursor(ahead["timestamp"], ahead["id"])
+        return response
+
+
+class MetricsView(APIView):
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        for name, value in answer_cache.stats().items():
+            registry.set_gauge(f"morph_answer_cache_{name}", value)
+        registry.set_gauge("morph_llm_queue_depth", get_admission().depth)
+        if get_chat_writer.is_loaded():
+            registry.set_gauge("morph_chatlog_pending", get_chat_writer().depth)
+        if get_embedding.is_loaded():
+            for name, value in get_embedding().stats().items():
+                registry.set_gauge(f"morph_query_embedding_cache_{name}", value)
+
+        if request.query_params.get("summary") in ("1", "true"):
+            return Response(registry.summary(), status=status.HTTP_200_OK)
+        return HttpResponse(registry.render_prometheus(), content_type="text/plain; version=0.0.4")
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class MorphAuthConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'morph_auth'
+
+    def ready(self):
+        from . import signals  # noqa: F401
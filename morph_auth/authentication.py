@@ -0,0 +1,109 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+__all__ = ["CachedTokenAuthentication", "TokenCache", "token_cache"]
+
+DEFAULT_TTL = 30
+DEFAULT_MAX_ENTRIES = 10000
+SHARED_KEY_PREFIX = "morph_auth:token:"
+
+
+# Bounded token -> (user, token) LRU with a short TTL, optionally backed by a shared Django cache.
+# The TTL also bounds how long another worker may keep serving an entry this process invalidated.
+class TokenCache:
+    def __init__(self, ttl=DEFAULT_TTL, max_entries=DEFAULT_MAX_ENTRIES, alias=None):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.alias = alias
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._keys_by_user: dict = {}
+
+    @property
+    def shared(self):
+        return caches[self.alias] if self.alias else None
+
+    def _remember(self, key: str, entry: tuple) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, entry)
+            self._entries.move_to_end(key)
+            self._keys_by_user.setdefault(entry[0].pk, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._forget(next(iter(self._entries)))
+
+    def _forget(self, key: str) -> None:
+        _, (user, _) = self._entries.pop(key)
+        keys = self._keys_by_user.get(user.pk)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._keys_by_user[user.pk]
+
+    def get(self, key: str):
+        with self._lock:
+            found = self._entries.get(key)
+            if found is not None:
+                if found[0] > time.monotonic():
+                    self._entries.move_to_end(key)
+                    return found[1]
+                self._forget(key)
+
+        if self.shared is not None:
+            entry = self.shared.get(SHARED_KEY_PREFIX + key)
+            if entry is not None:
+                self._remember(key, entry)
+                return entry
+        return None
+
+    def set(self, key: str, user, token) -> None:
+        entry = (user, token)
+        self._remember(key, entry)
+        if self.shared is not None:
+            self.shared.set(SHARED_KEY_PREFIX + key, entry, self.ttl)
+
+    def invalidate(self, key: str) -> None:
+        with self._lock:
+            if key in self._entries:
+                self._forget(key)
+        if self.shared is not None:
+            self.shared.delete(SHARED_KEY_PREFIX + key)
+
+    def invalidate_user(self, user_id) -> None:
+        with self._lock:
+            keys = set(self._keys_by_user.get(user_id, ()))
+        if self.shared is not None:
+            # Other workers may have cached the user; the token key is the only handle we share.
+            keys.update(Token.objects.filter(user_id=user_id).values_list("key", flat=True))
+        for key in keys:
+            self.invalidate(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_user.clear()
+
+
+token_cache = TokenCache(
+    ttl=getattr(settings, "MORPH_AUTH_TOKEN_CACHE_TTL", DEFAULT_TTL),
+    max_entries=getattr(settings, "MORPH_AUTH_TOKEN_CACHE_SIZE", DEFAULT_MAX_ENTRIES),
+    alias=getattr(settings, "MORPH_AUTH_TOKEN_CACHE_ALIAS", None),
+)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    def authenticate_credentials(self, key):
+        entry = token_cache.get(key)
+        if entry is None:
+            user, token = super().authenticate_credentials(key)
+            token_cache.set(key, user, token)
+        else:
+            user, token = entry
+        # Views mutate request.user (e.g. UserUpdateView); never hand out the cached instance itself.
+        return (copy.copy(user), token)
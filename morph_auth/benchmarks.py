@@ -0,0 +1,74 @@
+import math
+from contextlib import contextmanager
+from datetime import timedelta
+from pathlib import Path
+
+from django.db import connection, connections
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.utils import timezone
+
+from morph_auth.models import ChatLog, User
+
+__all__ = [
+    "LESSON_TITLES", "percentile", "seed_chat_logs", "seed_users", "throwaway_database", "write_comparison",
+]
+
+# Shared by the bench_* and explain_hot_queries management commands.
+
+LESSON_TITLES = ["Python", "Javascript", "Dart"]
+
+
+def percentile(values: list, q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(q * len(ordered)) - 1))]
+
+
+@contextmanager
+def throwaway_database(workdir: Path):
+    if connection.vendor == "sqlite":
+        # Worker threads need a real file; the default in-memory test database is per connection.
+        connection.settings_dict.setdefault("TEST", {})["NAME"] = str(workdir / "bench.sqlite3")
+
+    setup_test_environment(debug=False)
+    old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+    try:
+        yield
+    finally:
+        connections.close_all()
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+
+def seed_users(prefix: str, count: int) -> list:
+    users = [User(email=f"{prefix}-{i}@example.invalid", username=f"{prefix}{i}") for i in range(count)]
+    for user in users:
+        user.set_unusable_password()
+    return User.objects.bulk_create(users)
+
+
+def seed_chat_logs(users, rng, per_user: int, max_age: timedelta, min_age: timedelta = timedelta(0)) -> int:
+    now = timezone.now()
+    low, high = int(min_age.total_seconds()), int(max_age.total_seconds())
+    logs = [
+        ChatLog(
+            user=user,
+            role="user" if n % 2 == 0 else "ai",
+            content=f"pesan sintetis {n}",
+            timestamp=now - timedelta(seconds=rng.randint(low, high)),
+        )
+        for user in users
+        for n in range(per_user)
+    ]
+    ChatLog.objects.bulk_create(logs, batch_size=2000)
+    return len(logs)
+
+
+def write_comparison(command, baseline: dict, report: dict, rows) -> None:
+    # rows are (name, before, after, unit, higher_is_better); the ratio is always "x times better".
+    command.stdout.write(command.style.MIGRATE_HEADING(f"\n== {baseline['label']} -> {report['label']}"))
+    for name, before, after, unit, higher_is_better in rows:
+        better, worse = (after, before) if higher_is_better else (before, after)
+        ratio = f"{better / worse:.2f}x" if worse else "n/a"
+        command.stdout.write(f"{name:<18} {before:10.3f} {unit} -> {after:10.3f} {unit}  ({ratio})")
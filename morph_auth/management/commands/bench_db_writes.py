@@ -0,0 +1,154 @@
+import json
+import random
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from collections import Counter
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+from django.db import DatabaseError, close_old_connections, connection, connections, transaction
+from django.utils import timezone
+
+from morph_auth.benchmarks import LESSON_TITLES, percentile, seed_users, throwaway_database, write_comparison
+from morph_auth.models import ChatLog, LessonProgress
+
+
+class Command(BaseCommand):
+    help = (
+        "Hammer a throwaway copy of the configured database with concurrent chat-turn inserts and "
+        "progress upserts, then report write throughput, latency and lock errors."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--threads", type=int, default=8, help="Concurrent writers, one connection each.")
+        parser.add_argument("--ops", type=int, default=2000, help="Total write operations across all threads.")
+        parser.add_argument("--users", type=int, default=50)
+        parser.add_argument(
+            "--progress-ratio", type=float, default=0.3,
+            help="Share of operations that upsert LessonProgress instead of inserting a chat turn.",
+        )
+        parser.add_argument("--label", default="current", help="Name stored with the results, e.g. sqlite/postgres.")
+        parser.add_argument("--output", help="Write the results to this JSON file.")
+        parser.add_argument("--compare-to", help="JSON file from an earlier run to diff against.")
+
+    def handle(self, *args, **options):
+        workdir = Path(tempfile.mkdtemp(prefix="morph-dbbench-"))
+        try:
+            with throwaway_database(workdir):
+                report = self.run_bench(options)
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+        report["label"] = options["label"]
+        self.print_report(report)
+        if options["output"]:
+            Path(options["output"]).write_text(json.dumps(report, indent=2))
+            self.stdout.write(f"Saved results to {options['output']}")
+        if options["compare_to"]:
+            self.compare(json.loads(Path(options["compare_to"]).read_text()), report)
+
+    def run_bench(self, options) -> dict:
+        user_ids = [user.pk for user in seed_users("dbbench", options["users"])]
+        settings_dict = connection.settings_dict
+        config = {
+            "vendor": connection.vendor,
+            "conn_max_age": settings_dict.get("CONN_MAX_AGE"),
+            "pool": bool(settings_dict.get("OPTIONS", {}).get("pool")),
+            "threads": options["threads"],
+            "ops": options["ops"],
+            "progress_ratio": options["progress_ratio"],
+        }
+        if connection.vendor == "sqlite":
+            with connection.cursor() as cursor:
+                cursor.execute("PRAGMA journal_mode")
+                config["journal_mode"] = cursor.fetchone()[0]
+        connections.close_all()
+
+        results, errors, lock = [], Counter(), threading.Lock()
+        remaining = [options["ops"]]
+
+        def worker(seed: int):
+            rng = random.Random(seed)
+            try:
+                while True:
+                    with lock:
+                        if remaining[0] <= 0:
+                            return
+                        remaining[0] -= 1
+                    kind = "progress" if rng.random() < options["progress_ratio"] else "chat"
+                    start = time.perf_counter()
+                    try:
+                        self.write(kind, rng.choice(user_ids), rng)
+                    except DatabaseError as e:
+                        with lock:
+                            errors[type(e).__name__ + ": " + str(e).splitlines()[0][:80]] += 1
+                        continue
+                    finally:
+                        # Same connection lifecycle as a request: closed unless CONN_MAX_AGE/pool keeps it.
+                        close_old_connections()
+                    with lock:
+                        results.append((kind, time.perf_counter() - start))
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(max(1, options["threads"]))]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        wall = time.perf_counter() - start
+
+        report = {"config": config, "wall_seconds": wall, "errors": dict(errors), "ops": {}}
+        for kind in ("all", "chat", "progress"):
+            seconds = [s for k, s in results if kind in ("all", k)]
+            report["ops"][kind] = {
+                "count": len(seconds),
+                "per_sec": len(seconds) / wall if wall else 0.0,
+                "p50": percentile(seconds, 0.50),
+                "p95": percentile(seconds, 0.95),
+                "p99": percentile(seconds, 0.99),
+            }
+        return report
+
+    def write(self, kind: str, user_id: int, rng: random.Random) -> None:
+        if kind == "progress":
+            LessonProgress.objects.update_or_create(
+                user_id=user_id, title=rng.choice(LESSON_TITLES),
+                defaults={"page": rng.randint(1, 10)},
+            )
+            return
+        now = timezone.now()
+        with transaction.atomic():
+            ChatLog.objects.bulk_create([
+                ChatLog(user_id=user_id, role="user", content="pertanyaan sintetis", timestamp=now,
+                        message_id=uuid.uuid4().hex),
+                ChatLog(user_id=user_id, role="ai", content="jawaban sintetis " * 20, timestamp=now,
+                        message_id=uuid.uuid4().hex),
+            ])
+
+    def print_report(self, report: dict) -> None:
+        config = report["config"]
+        self.stdout.write(self.style.MIGRATE_HEADING(f"\n== {report['label']} ({config['vendor']})"))
+        self.stdout.write(json.dumps(config))
+        for kind, values in report["ops"].items():
+            self.stdout.write(
+                f"{kind:<9} {values['count']:6d} ops  {values['per_sec']:8.1f} ops/s  "
+                f"p50 {values['p50'] * 1000:7.2f} ms  p95 {values['p95'] * 1000:7.2f} ms  "
+                f"p99 {values['p99'] * 1000:7.2f} ms"
+            )
+        if report["errors"]:
+            self.stdout.write(self.style.WARNING(f"errors: {report['errors']}"))
+
+    def compare(self, baseline: dict, report: dict) -> None:
+        rows = []
+        for kind, current in report["ops"].items():
+            before = baseline["ops"].get(kind)
+            if before:
+                rows.append((f"{kind} ops/s", before["per_sec"], current["per_sec"], "/s", True))
+                rows.append((f"{kind} p95", before["p95"] * 1000, current["p95"] * 1000, "ms", False))
+        rows.append(("errors", sum(baseline["errors"].values()), sum(report["errors"].values()), "", False))
+        write_comparison(self, baseline, report, rows)
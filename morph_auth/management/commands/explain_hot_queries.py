@@ -0,0 +1,85 @@
+import json
+import random
+import time
+from datetime import timedelta
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from morph_auth.benchmarks import LESSON_TITLES, seed_chat_logs, seed_users, write_comparison
+from morph_auth.models import LessonProgress, User
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed synthetic users, chat logs and progress inside a rolled-back transaction, "
+        "then print EXPLAIN plans and timings for the hottest ChatLog/LessonProgress queries."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=50)
+        parser.add_argument("--logs-per-user", type=int, default=500)
+        parser.add_argument("--progress-per-user", type=int, default=20)
+        parser.add_argument("--repeat", type=int, default=200, help="Executions per query when timing.")
+        parser.add_argument("--label", default="current", help="Name stored with the results, e.g. before/after.")
+        parser.add_argument("--output", help="Write the timings to this JSON file.")
+        parser.add_argument("--compare-to", help="JSON file from an earlier run to diff against.")
+
+    def handle(self, *args, **options):
+        results = {}
+        with transaction.atomic():
+            user = self.seed(options["users"], options["logs_per_user"], options["progress_per_user"])
+            for name, queryset in self.hot_queries(user).items():
+                results[name] = self.measure(name, queryset, options["repeat"])
+            transaction.set_rollback(True)
+
+        report = {"label": options["label"], "vendor": connection.vendor, "queries": results}
+        if options["output"]:
+            Path(options["output"]).write_text(json.dumps(report, indent=2))
+            self.stdout.write(f"Saved timings to {options['output']}")
+        if options["compare_to"]:
+            self.compare(json.loads(Path(options["compare_to"]).read_text()), report)
+
+    def seed(self, users: int, logs_per_user: int, progress_per_user: int) -> User:
+        rng = random.Random(42)
+        # Runs against the real database (rolled back), so keep the synthetic emails unique.
+        seeded = seed_users(f"bench{int(time.time())}", users)
+        logs = seed_chat_logs(seeded, rng, logs_per_user, max_age=timedelta(days=90))
+
+        progress = [
+            LessonProgress(user=user, title=f"{LESSON_TITLES[n % 3]} {n}", page=rng.randint(1, 10))
+            for user in seeded
+            for n in range(progress_per_user)
+        ]
+        LessonProgress.objects.bulk_create(progress, batch_size=2000)
+
+        self.stdout.write(f"Seeded {len(seeded)} users, {logs} chat logs, {len(progress)} progress rows")
+        return seeded[len(seeded) // 2]
+
+    def hot_queries(self, user: User) -> dict:
+        return {
+            "recent_chat_logs": user.chat_logs.order_by("-timestamp")[:10],
+            "lesson_progress": user.lesson_progress.all(),
+            "progress_lookup": LessonProgress.objects.filter(user=user, title=f"{LESSON_TITLES[0]} 0"),
+        }
+
+    def measure(self, name: str, queryset, repeat: int) -> dict:
+        self.stdout.write(self.style.MIGRATE_HEADING(f"\n== {name}"))
+        self.stdout.write(queryset.explain())
+
+        list(queryset.all())
+        start = time.perf_counter()
+        for _ in range(repeat):
+            list(queryset.all())
+        avg_ms = (time.perf_counter() - start) * 1000 / repeat
+
+        self.stdout.write(f"avg {avg_ms:.3f} ms over {repeat} runs")
+        return {"avg_ms": avg_ms, "repeat": repeat}
+
+    def compare(self, baseline: dict, report: dict) -> None:
+        rows = [
+            (name, baseline["queries"][name]["avg_ms"], current["avg_ms"], "ms", False)
+            for name, current in report["queries"].items() if name in baseline["queries"]
+        ]
+        write_comparison(self, baseline, report, rows)
@@ -0,0 +1,39 @@
+# Generated by Django 5.1 on 2026-10-18 09:12
+
+from django.db import migrations, models
+
+
+def dedupe_lesson_progress(apps, schema_editor):
+    LessonProgress = apps.get_model('morph_auth', 'LessonProgress')
+    duplicates = (
+        LessonProgress.objects.values('user_id', 'title')
+        .annotate(rows=models.Count('id'))
+        .filter(rows__gt=1)
+    )
+    for dup in duplicates:
+        rows = LessonProgress.objects.filter(user_id=dup['user_id'], title=dup['title']).order_by('-date', '-id')
+        keep = rows.values_list('id', flat=True).first()
+        rows.exclude(id=keep).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('morph_auth', '0003_remove_user_chat_history'),
+    ]
+
+    operations = [
+        migrations.RunPython(dedupe_lesson_progress, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='chatlog',
+            index=models.Index(fields=['user', 'timestamp', 'id'], name='chatlog_user_ts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='lessonprogress',
+            index=models.Index(fields=['user', '-date'], name='progress_user_date_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='lessonprogress',
+            constraint=models.UniqueConstraint(fields=('user', 'title'), name='progress_user_title_uniq'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.1 on 2026-10-18 17:51
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('morph_auth', '0004_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='lessonprogress',
+            options={'ordering': ['-date', '-id']},
+        ),
+    ]
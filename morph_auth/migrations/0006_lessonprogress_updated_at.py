@@ -0,0 +1,42 @@
+# Generated by Django 5.1 on 2026-10-18 18:00
+
+import datetime
+
+from django.db import migrations, models
+
+
+def backfill_updated_at(apps, schema_editor):
+    # Existing rows only know their day; keep them in their old -date, -id order.
+    LessonProgress = apps.get_model('morph_auth', 'LessonProgress')
+    rows = LessonProgress.objects.order_by('date', 'id')
+    for n, row in enumerate(rows.iterator()):
+        stamp = datetime.datetime.combine(row.date, datetime.time.min, tzinfo=datetime.timezone.utc)
+        LessonProgress.objects.filter(pk=row.pk).update(updated_at=stamp + datetime.timedelta(microseconds=n))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('morph_auth', '0005_lessonprogress_ordering'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='lessonprogress',
+            options={'ordering': ['-updated_at', '-id']},
+        ),
+        migrations.RemoveIndex(
+            model_name='lessonprogress',
+            name='progress_user_date_idx',
+        ),
+        migrations.AddField(
+            model_name='lessonprogress',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.RunPython(backfill_updated_at, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='lessonprogress',
+            index=models.Index(fields=['user', '-updated_at'], name='progress_user_updated_idx'),
+        ),
+    ]
@@ -9,6 +9,10 @@ class UserManager(BaseUserManager):
         user.save()
         return user
 
+    def get_by_natural_key(self, email):
+        # Login hands out the token right after authenticating; fetch it in the same query.
+        return self.select_related("auth_token").get(**{self.model.USERNAME_FIELD: email})
+
     def create_superuser(self, email, username, password):
         user = self.create_user(email, username, password)
         user.is_staff = True
@@ -37,9 +41,17 @@ class LessonProgress(models.Model):
     date = models.DateField(auto_now_add=True)
     title = models.CharField(max_length=255)
     page = models.PositiveIntegerField()
+    # Progress rows are updated in place, so neither date nor id says which lesson was touched last.
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
-        ordering = ['-date']
+        ordering = ['-updated_at', '-id']
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'title'], name='progress_user_title_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['user', '-updated_at'], name='progress_user_updated_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user.email} - {self.title} (Page {self.page})"
@@ -58,6 +70,9 @@ class ChatLog(models.Model):
 
     class Meta:
         ordering = ['timestamp']
+        indexes = [
+            models.Index(fields=['user', 'timestamp', 'id'], name='chatlog_user_ts_idx'),
+        ]
 
     def __str__(self):
         return f"[{self.timestamp}] {self.user.email} - {self.role}: {self.content[:50]}"
\ No newline at end of file
@@ -0,0 +1,20 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from .authentication import token_cache
+from .models import User
+
+
+@receiver(post_save, sender=User)
+def invalidate_cached_user(sender, instance, **kwargs):
+    # Profile edits, password changes and deactivation must not be served from a stale entry.
+    transaction.on_commit(lambda: token_cache.invalidate_user(instance.pk))
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_cached_token(sender, instance, **kwargs):
+    # key is Token's primary key, which delete() resets to None before on_commit runs.
+    key = instance.key
+    transaction.on_commit(lambda: token_cache.invalidate(key))
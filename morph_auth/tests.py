@@ -1,3 +1,97 @@
+from datetime import timedelta
+from unittest import mock
+
 from django.test import TestCase
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from morph_ai.rag.chat_service import load_progress
+from morph_ai.rag.retrieval import retrieval_scope
+from morph_auth.authentication import token_cache
+from morph_auth.models import LessonProgress, User
+
+
+class LessonProgressOrderingTests(TestCase):
+    client_class = APIClient
+
+    def setUp(self):
+        self.user = User.objects.create_user("progress@example.invalid", "progress")
+        self.client.force_authenticate(self.user)
+
+    def save_progress(self, title, page):
+        response = self.client.post("/api/auth/me/progress/", {"title": title, "page": page}, format="json")
+        self.assertEqual(response.status_code, 200)
+
+    def test_updating_an_older_lesson_makes_it_current(self):
+        self.save_progress("Python", 2)
+        # Python was started on an earlier day; Dart today, then the learner goes back to Python.
+        LessonProgress.objects.filter(user=self.user, title="Python").update(
+            updated_at=timezone.now() - timedelta(days=1)
+        )
+        self.save_progress("Dart", 1)
+        self.assertEqual(load_progress(self.user)[0].title, "Dart")
+
+        self.save_progress("Python", 3)
+        progress = load_progress(self.user)
+        self.assertEqual([(row.title, row.page) for row in progress], [("Python", 3), ("Dart", 1)])
+        self.assertEqual(retrieval_scope(progress, "apa itu list comprehension"), {"language": "Python", "page": 3})
+
+        response = self.client.get("/api/auth/me/progress/")
+        self.assertEqual([row["title"] for row in response.json()], ["Python", "Dart"])
+
+
+class TokenCacheInvalidationTests(TestCase):
+    client_class = APIClient
+
+    def setUp(self):
+        token_cache.clear()
+        self.addCleanup(token_cache.clear)
+        self.user = User.objects.create_user("cached@example.invalid", "cached", password="old-password")
+        self.key = Token.objects.create(user=self.user).key
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {self.key}")
+
+    def me(self):
+        return self.client.get("/api/auth/me/")
+
+    def cached_user(self):
+        entry = token_cache.get(self.key)
+        return entry and entry[0]
+
+    def test_logout_drops_the_token(self):
+        self.assertEqual(self.me().status_code, 200)
+        self.assertIsNotNone(self.cached_user())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post("/api/auth/logout/")
+        self.assertIsNone(self.cached_user())
+        self.assertEqual(self.me().status_code, 401)
+
+    def test_password_change_reloads_the_user(self):
+        self.assertEqual(self.me().status_code, 200)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.put("/api/auth/me/update/", {"password": "new-password"}, format="json")
+        self.assertIsNone(self.cached_user())
+        self.assertEqual(self.me().status_code, 200)
+        self.assertTrue(self.cached_user().check_password("new-password"))
+
+    def test_deactivated_user_is_rejected(self):
+        self.assertEqual(self.me().status_code, 200)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete("/api/auth/me/delete/")
+        self.assertIsNone(self.cached_user())
+        self.assertEqual(self.me().status_code, 401)
+
+    def test_entries_expire_after_the_ttl(self):
+        clock = mock.Mock(return_value=1000.0)
+        with mock.patch("morph_auth.authentication.time.monotonic", clock):
+            self.assertEqual(self.me().status_code, 200)
+            # Another worker deactivates the user; its invalidation never reaches this process.
+            User.objects.filter(pk=self.user.pk).update(is_active=False)
 
-# Create your tests here.
+            clock.return_value += token_cache.ttl - 1
+            self.assertEqual(self.me().status_code, 200)
+            clock.return_value += 2
+            self.assertEqual(self.me().status_code, 401)
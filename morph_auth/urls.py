@@ -1,9 +1,10 @@
 from django.urls import path
-from .views import RegisterView, LoginView, UserDetailView, UserUpdateView, UserDeleteView,UserLessonProgressView
+from .views import RegisterView, LoginView, LogoutView, UserDetailView, UserUpdateView, UserDeleteView,UserLessonProgressView
 
 urlpatterns = [
     path("register/", RegisterView.as_view()),
     path("login/", LoginView.as_view()),
+    path("logout/", LogoutView.as_view()),
     path("me/", UserDetailView.as_view()),
     path("me/update/", UserUpdateView.as_view()),
     path("me/delete/", UserDeleteView.as_view()),
@@ -10,17 +10,47 @@ from .serializers import RegisterSerializer, LoginSerializer
 
 User = get_user_model()
 
-def serialize_lesson_progress(user):
+PROFILE_FIELDS = ("email", "username", "lesson_progress")
+PROFILE_PROGRESS_LIMIT = 50
+PROGRESS_MAX_PAGE_SIZE = 200
+
+
+def progress_rows(user, limit, offset=0):
+    rows = user.lesson_progress.values_list("date", "title", "page")
     return [
         {
-            "date": progress.date,
-            "title": progress.title,
-            "page": progress.page
+            "date": date,
+            "title": title,
+            "page": page
         }
-        for progress in user.lesson_progress.all()
+        for date, title, page in rows[offset:offset + limit]
     ]
 
 
+def build_profile(user, fields=PROFILE_FIELDS, progress_limit=PROFILE_PROGRESS_LIMIT, new_user=False):
+    data = {}
+    if "email" in fields:
+        data["email"] = user.email
+    if "username" in fields:
+        data["username"] = user.username
+    if "lesson_progress" in fields:
+        # One extra row tells us whether the capped list is complete, without a COUNT query.
+        rows = [] if new_user else progress_rows(user, progress_limit + 1)
+        data["lesson_progress"] = rows[:progress_limit]
+        if len(rows) > progress_limit:
+            data["lesson_progress_more"] = True
+    return data
+
+
+def user_token(user):
+    # get_by_natural_key select_related()s the token, so login normally needs no extra query here.
+    try:
+        return user.auth_token
+    except Token.DoesNotExist:
+        token, _ = Token.objects.get_or_create(user=user)
+        return token
+
+
 class RegisterView(APIView):
     permission_classes = []
     authentication_classes = []
@@ -33,11 +63,7 @@ class RegisterView(APIView):
 
         return Response({
             "token": token.key,
-            "user": {
-                "email": user.email,
-                "username": user.username,
-                "lesson_progress": serialize_lesson_progress(user)
-            }
+            "user": build_profile(user, new_user=True)
         }, status=status.HTTP_201_CREATED)
 
 
@@ -49,29 +75,36 @@ class LoginView(APIView):
         serializer = LoginSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         user = serializer.validated_data["user"]
-        token, _ = Token.objects.get_or_create(user=user)
 
         return Response({
-            "token": token.key,
-            "user": {
-                "email": user.email,
-                "username": user.username,
-                "lesson_progress": serialize_lesson_progress(user)
-            }
+            "token": user_token(user).key,
+            "user": build_profile(user)
         }, status=status.HTTP_200_OK)
 
 
+class LogoutView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        # Deleting the token also drops it from the auth cache (see signals).
+        Token.objects.filter(user=request.user).delete()
+        return Response({"detail": "Logged out."}, status=status.HTTP_200_OK)
+
+
 class UserDetailView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        user = request.user
-        data = {
-            "email": user.email,
-            "username": user.username,
-            "lesson_progress": serialize_lesson_progress(user)
-        }
-        return Response(data)
+        fields = request.query_params.get("fields")
+        if fields:
+            fields = {field.strip() for field in fields.split(",") if field.strip()}
+            unknown = fields - set(PROFILE_FIELDS)
+            if unknown:
+                return Response(
+                    {"error": f"Field tidak dikenal: {', '.join(sorted(unknown))}."},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+        return Response(build_profile(request.user, fields or PROFILE_FIELDS))
 
 
 class UserUpdateView(APIView):
@@ -100,6 +133,17 @@ class UserDeleteView(APIView):
 class UserLessonProgressView(APIView):
     permission_classes = [IsAuthenticated]
 
+    def get(self, request):
+        try:
+            limit = min(int(request.query_params.get("limit", PROFILE_PROGRESS_LIMIT)), PROGRESS_MAX_PAGE_SIZE)
+            offset = int(request.query_params.get("offset", 0))
+        except ValueError:
+            return Response({"error": "Parameter 'limit' atau 'offset' tidak valid."}, status=status.HTTP_400_BAD_REQUEST)
+        if limit < 1 or offset < 0:
+            return Response({"error": "Parameter 'limit' atau 'offset' tidak valid."}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response(progress_rows(request.user, limit, offset), status=status.HTTP_200_OK)
+
     def post(self, request):
         user = request.user
         title = request.data.get("title")
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class MorphLessonConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'morph_lesson'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,90 @@
+import hashlib
+import json
+import threading
+import time
+
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .models import Lesson, Page
+
+__all__ = ["get_catalogue", "invalidate_catalogue"]
+
+VERSION_CACHE_KEY = "morph_lesson:catalogue_version"
+# How often a process re-checks the database for changes made where its cache could not see them.
+VERSION_CHECK_SECONDS = 5
+
+_local = {"version": None, "signature": None, "check_after": 0.0, "catalogue": None}
+_lock = threading.Lock()
+
+def _etag(payload) -> str:
+    raw = json.dumps(payload, sort_keys=True, cls=DjangoJSONEncoder).encode("utf-8")
+    return hashlib.sha256(raw).hexdigest()[:32]
+
+def page_payload(page) -> dict:
+    return {
+        "page": page.page,
+        "title": page.title,
+        "filename": page.filename,
+        "file_url": page.file_url
+    }
+
+def build_catalogue(version: float) -> dict:
+    lessons = []
+    pages = {}
+    for lesson in Lesson.objects.prefetch_related("pages"):
+        lesson_pages = []
+        for page in lesson.pages.all():
+            payload = page_payload(page)
+            lesson_pages.append(payload)
+            entry = {"lesson": lesson.title, "page": payload}
+            pages[(lesson.title.lower(), page.page)] = (entry, _etag(entry))
+        lessons.append({"title": lesson.title, "pages": lesson_pages})
+
+    titles = [lesson["title"] for lesson in lessons]
+    return {
+        "lessons_by_title": {lesson["title"].lower(): lesson for lesson in lessons},
+        "lessons": lessons,
+        "lessons_etag": _etag(lessons),
+        "titles": titles,
+        "titles_etag": _etag(titles),
+        "pages": pages,
+        "last_modified": int(version),
+    }
+
+def catalogue_signature() -> str:
+    # load_lessons rewrites Lesson.content_hash whenever a lesson's files change, and the page rows
+    # cover admin edits to a title or URL, so this notices changes made by another process even
+    # when the default cache is per process.
+    lessons = list(Lesson.objects.order_by("pk").values_list("pk", "title", "content_hash"))
+    pages = list(Page.objects.order_by("pk").values_list("pk", "lesson_id", "page", "title", "filename", "file_url"))
+    return _etag([lessons, pages])
+
+def _current_version() -> float:
+    version = cache.get(VERSION_CACHE_KEY)
+    if version is None:
+        version = time.time()
+        cache.add(VERSION_CACHE_KEY, version, None)
+        version = cache.get(VERSION_CACHE_KEY, version)
+    return version
+
+def get_catalogue() -> dict:
+    version = _current_version()
+    catalogue = _local["catalogue"]
+    if catalogue is not None and _local["version"] == version and time.monotonic() < _local["check_after"]:
+        return catalogue
+
+    with _lock:
+        signature = catalogue_signature()
+        if _local["signature"] is not None and _local["signature"] != signature:
+            invalidate_catalogue()
+            version = _current_version()
+        if _local["catalogue"] is None or _local["version"] != version:
+            _local["catalogue"] = build_catalogue(version)
+            _local["version"] = version
+        _local["signature"] = signature
+        _local["check_after"] = time.monotonic() + VERSION_CHECK_SECONDS
+        return _local["catalogue"]
+
+def invalidate_catalogue() -> None:
+    cache.set(VERSION_CACHE_KEY, time.time(), None)
@@ -0,0 +1,125 @@
+import gzip
+import hashlib
+import json
+import re
+import threading
+from pathlib import Path
+
+from django.conf import settings
+
+try:
+    import brotli
+except ImportError:  # optional: only gzip variants are built without it
+    brotli = None
+
+LESSON_MEDIA_DIR = Path(settings.MEDIA_ROOT) / "lessons"
+RANGE_PATTERN = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+def _compress_gzip(data: bytes) -> bytes:
+    return gzip.compress(data, compresslevel=9, mtime=0)
+
+def _compress_brotli(data: bytes) -> bytes:
+    return brotli.compress(data, quality=11)
+
+def variant_encodings() -> list:
+    encodings = [("gzip", ".gz", _compress_gzip)]
+    if brotli is not None:
+        encodings.insert(0, ("br", ".br", _compress_brotli))
+    return encodings
+
+def build_compressed_variants(path: Path) -> int:
+    built = 0
+    source_mtime = path.stat().st_mtime_ns
+    data = None
+    for _, suffix, compress in variant_encodings():
+        target = path.with_name(path.name + suffix)
+        if target.exists() and target.stat().st_mtime_ns >= source_mtime:
+            continue
+        if data is None:
+            data = path.read_bytes()
+        target.write_bytes(compress(data))
+        built += 1
+    return built
+
+def page_file(lesson_title: str, filename: str):
+    base = LESSON_MEDIA_DIR.resolve()
+    path = (base / lesson_title.lower() / filename).resolve()
+    if base not in path.parents or not path.is_file():
+        return None
+    return path
+
+def accepted_encodings(accept_encoding: str) -> set:
+    accepted = set()
+    for part in accept_encoding.split(","):
+        name, *params = [p.strip() for p in part.split(";")]
+        quality = 1.0
+        for param in params:
+            key, _, value = param.partition("=")
+            if key.strip() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if name and quality > 0:
+            accepted.add(name.lower())
+    return accepted
+
+def pick_variant(path: Path, accept_encoding: str):
+    accepted = accepted_encodings(accept_encoding)
+    source_mtime = path.stat().st_mtime_ns
+    for encoding, suffix, _ in variant_encodings():
+        if encoding not in accepted:
+            continue
+        variant = path.with_name(path.name + suffix)
+        if variant.exists() and variant.stat().st_mtime_ns >= source_mtime:
+            return variant, encoding
+    return path, None
+
+def file_etag(path: Path, encoding=None) -> str:
+    stat = path.stat()
+    tag = f"{stat.st_size:x}-{stat.st_mtime_ns:x}"
+    return f"{tag}-{encoding}" if encoding else tag
+
+def parse_range(header: str, size: int):
+    # Only single byte ranges are supported; anything else falls back to a full response.
+    match = RANGE_PATTERN.match(header.strip())
+    if not match or size == 0:
+        return None
+    start, end = match.groups()
+    if not start and not end:
+        return None
+    if not start:
+        length = int(end)
+        if length == 0:
+            return "unsatisfiable"
+        return max(size - length, 0), size - 1
+    first = int(start)
+    last = min(int(end), size - 1) if end else size - 1
+    if first >= size or first > last:
+        return "unsatisfiable"
+    return first, last
+
+_bundles = {}
+_bundles_lock = threading.Lock()
+
+def lesson_bundle(lesson_title: str, pages: list, version) -> dict:
+    key = lesson_title.lower()
+    cached = _bundles.get(key)
+    if cached and cached["version"] == version:
+        return cached
+
+    bundle_pages = []
+    for page in pages:
+        path = page_file(lesson_title, page["filename"])
+        bundle_pages.append({**page, "content": path.read_text(encoding="utf-8") if path else None})
+
+    raw = json.dumps({"title": lesson_title, "pages": bundle_pages}, ensure_ascii=False).encode("utf-8")
+    bundle = {
+        "version": version,
+        "raw": raw,
+        "gzip": _compress_gzip(raw),
+        "etag": hashlib.sha256(raw).hexdigest()[:32],
+    }
+    with _bundles_lock:
+        _bundles[key] = bundle
+    return bundle
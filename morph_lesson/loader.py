@@ -0,0 +1,97 @@
+import hashlib
+import re
+from pathlib import Path
+
+from django.conf import settings
+from django.db import transaction
+
+from .content import build_compressed_variants
+from .models import Lesson, Page
+
+MEDIA_DIR = Path(settings.MEDIA_ROOT) / "lessons"
+PAGE_FIELDS = ["title", "filename", "file_url"]
+
+def extract_page_number(filename):
+    match = re.match(r'^(\d+)', filename)
+    return int(match.group(1)) if match else 0
+
+def extract_title(filename):
+    name = re.sub(r'^\d+\.', '', filename)
+    name = re.sub(r'\.md$', '', name)
+    return name.replace('_', ' ').strip()
+
+def build_file_path(lesson_title, filename):
+    return f"/media/lessons/{lesson_title.lower()}/{filename}"
+
+def folder_fingerprint(files) -> str:
+    digest = hashlib.sha256()
+    for file in files:
+        digest.update(file.name.encode("utf-8") + b"\0")
+        digest.update(hashlib.sha256(file.read_bytes()).digest())
+    return digest.hexdigest()
+
+def scan_pages(lesson_folder, files) -> dict:
+    pages = {}
+    for file in files:
+        pages[extract_page_number(file.name)] = {
+            "title": extract_title(file.name),
+            "filename": file.name,
+            "file_url": build_file_path(lesson_folder.name, file.name),
+        }
+    return pages
+
+def sync_lesson_pages(lesson, wanted: dict) -> dict:
+    current = {page.page: page for page in lesson.pages.all()}
+
+    to_delete = [page.pk for number, page in current.items() if number not in wanted]
+    to_create, to_update = [], []
+    for number, fields in wanted.items():
+        page = current.get(number)
+        if page is None:
+            to_create.append(Page(lesson=lesson, page=number, **fields))
+        elif any(getattr(page, name) != value for name, value in fields.items()):
+            for name, value in fields.items():
+                setattr(page, name, value)
+            to_update.append(page)
+
+    if to_delete:
+        Page.objects.filter(pk__in=to_delete).delete()
+    if to_update:
+        Page.objects.bulk_update(to_update, PAGE_FIELDS)
+    if to_create:
+        Page.objects.bulk_create(to_create)
+
+    return {"created": len(to_create), "updated": len(to_update), "deleted": len(to_delete)}
+
+def load_lessons(media_dir=MEDIA_DIR, force=False) -> dict:
+    stats = {"lessons": 0, "skipped": 0, "created": 0, "updated": 0, "deleted": 0, "compressed": 0}
+    folders = sorted(d for d in Path(media_dir).iterdir() if d.is_dir())
+
+    with transaction.atomic():
+        lessons = {lesson.title: lesson for lesson in Lesson.objects.select_for_update()}
+
+        for lesson_folder in folders:
+            files = sorted(lesson_folder.glob("*.md"))
+            fingerprint = folder_fingerprint(files)
+            lesson_title = lesson_folder.name.capitalize()
+            lesson = lessons.get(lesson_title)
+
+            if lesson and lesson.content_hash == fingerprint and not force:
+                stats["skipped"] += 1
+                continue
+
+            if lesson is None:
+                lesson = Lesson.objects.create(title=lesson_title)
+
+            for key, count in sync_lesson_pages(lesson, scan_pages(lesson_folder, files)).items():
+                stats[key] += count
+
+            lesson.content_hash = fingerprint
+            lesson.save(update_fields=["content_hash"])
+            stats["lessons"] += 1
+
+    for lesson_folder in folders:
+        for file in lesson_folder.glob("*.md"):
+            stats["compressed"] += build_compressed_variants(file)
+
+    return stats
@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from morph_lesson.loader import MEDIA_DIR, load_lessons
+
+
+class Command(BaseCommand):
+    help = "Sync Lesson/Page rows with media/lessons, applying only what changed in one transaction."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--media-dir", default=str(MEDIA_DIR), help="Folder with one sub-folder per lesson.")
+        parser.add_argument("--force", action="store_true", help="Re-check lessons even if their content hash is unchanged.")
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        stats = load_lessons(options["media_dir"], force=options["force"])
+        elapsed = time.perf_counter() - start
+
+        self.stdout.write(
+            f"lessons synced={stats['lessons']} skipped={stats['skipped']} | pages "
+            f"created={stats['created']} updated={stats['updated']} deleted={stats['deleted']} | "
+            f"compressed variants built={stats['compressed']} ({elapsed:.2f}s)"
+        )
+        self.stdout.write(self.style.SUCCESS("✅ Data lesson dan page berhasil dimuat ulang dari media."))
@@ -2,6 +2,7 @@ from django.db import models
 
 class Lesson(models.Model):
     title = models.CharField(max_length=100, unique=True)
+    content_hash = models.CharField(max_length=64, blank=True, default="")
 
     def __str__(self):
         return self.title
@@ -0,0 +1,12 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .catalogue import invalidate_catalogue
+from .models import Lesson, Page
+
+
+@receiver([post_save, post_delete], sender=Lesson)
+@receiver([post_save, post_delete], sender=Page)
+def invalidate_lesson_catalogue(sender, **kwargs):
+    transaction.on_commit(invalidate_catalogue)
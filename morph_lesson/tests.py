@@ -1,3 +1,116 @@
+import os
+import tempfile
+from pathlib import Path
+from unittest import mock
+
 from django.test import TestCase
+from django.utils.http import http_date
+from rest_framework.test import APIClient
+
+from morph_auth.models import User
+from morph_lesson import catalogue
+from morph_lesson.loader import load_lessons
+from morph_lesson.models import Lesson, Page
+
+
+class CatalogueSignatureTests(TestCase):
+    def setUp(self):
+        lesson = Lesson.objects.create(title="Python", content_hash="abc")
+        self.page = Page.objects.create(
+            lesson=lesson, page=1, title="Sintaks Dasar", filename="page1.md", file_url="/media/lessons/python/page1.md"
+        )
+        catalogue.invalidate_catalogue()
+        catalogue.get_catalogue()
+
+    def edited_elsewhere(self, **fields):
+        # QuerySet.update skips the signals, like an edit made through another worker's cache.
+        Page.objects.filter(pk=self.page.pk).update(**fields)
+        catalogue._local["check_after"] = 0.0
+        return catalogue.get_catalogue()["pages"][("python", 1)][0]["page"]
+
+    def test_page_title_and_url_edits_are_noticed(self):
+        self.assertEqual(self.edited_elsewhere(title="Sintaks Python")["title"], "Sintaks Python")
+        page = self.edited_elsewhere(file_url="https://cdn.example.invalid/python/page1.md")
+        self.assertEqual(page["file_url"], "https://cdn.example.invalid/python/page1.md")
+
+
+class LessonLoaderTests(TestCase):
+    def setUp(self):
+        workdir = tempfile.TemporaryDirectory()
+        self.addCleanup(workdir.cleanup)
+        self.media = Path(workdir.name)
+        self.folder = self.media / "python"
+        self.folder.mkdir()
+        self.write("1.Sintaks_Dasar.md", "# Sintaks\n")
+        self.write("2.Variabel.md", "# Variabel\n")
+
+    def write(self, name, text):
+        (self.folder / name).write_text(text, encoding="utf-8")
+
+    def load(self, **kwargs):
+        stats = load_lessons(self.media, **kwargs)
+        return {key: stats[key] for key in ("lessons", "skipped", "created", "updated", "deleted")}
+
+    def pages(self):
+        return list(Page.objects.filter(lesson__title="Python").values_list("page", "title"))
+
+    def test_only_the_difference_is_applied(self):
+        self.assertEqual(self.load(), {"lessons": 1, "skipped": 0, "created": 2, "updated": 0, "deleted": 0})
+        page_pk = Page.objects.get(page=2).pk
+        self.assertEqual(self.load(), {"lessons": 0, "skipped": 1, "created": 0, "updated": 0, "deleted": 0})
+
+        (self.folder / "1.Sintaks_Dasar.md").unlink()
+        (self.folder / "2.Variabel.md").rename(self.folder / "2.Variabel_dan_Tipe_Data.md")
+        self.write("3.Operasi.md", "# Operasi\n")
+        self.assertEqual(self.load(), {"lessons": 1, "skipped": 0, "created": 1, "updated": 1, "deleted": 1})
+        self.assertEqual(self.pages(), [(2, "Variabel dan Tipe Data"), (3, "Operasi")])
+        # Updated in place, so anything pointing at the page row keeps working.
+        self.assertEqual(Page.objects.get(page=2).pk, page_pk)
+
+    def test_force_rechecks_without_rewriting_unchanged_pages(self):
+        self.load()
+        self.assertEqual(self.load(force=True), {"lessons": 1, "skipped": 0, "created": 0, "updated": 0, "deleted": 0})
+        self.assertEqual(self.pages(), [(1, "Sintaks Dasar"), (2, "Variabel")])
+
+
+class LessonContentConditionalTests(TestCase):
+    client_class = APIClient
+    url = "/api/lesson/lesson/Python/page/1/content/"
+    body = b"# Halaman 1\n\nSintaks dasar Python.\n"
+
+    def setUp(self):
+        workdir = tempfile.TemporaryDirectory()
+        self.addCleanup(workdir.cleanup)
+        media = Path(workdir.name)
+        (media / "python").mkdir()
+        self.path = media / "python" / "page1.md"
+        self.path.write_bytes(self.body)
+        self.mtime = 1_700_000_000
+        os.utime(self.path, (self.mtime, self.mtime))
+        patcher = mock.patch("morph_lesson.content.LESSON_MEDIA_DIR", media)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        lesson = Lesson.objects.create(title="Python")
+        Page.objects.create(lesson=lesson, page=1, title="Sintaks Dasar", filename="page1.md", file_url="/media/page1.md")
+        catalogue.invalidate_catalogue()
+        self.client.force_authenticate(User.objects.create_user("reader@example.invalid", "reader"))
+
+    def test_range_is_served_when_no_precondition_matches(self):
+        response = self.client.get(self.url, HTTP_RANGE="bytes=0-10", HTTP_IF_NONE_MATCH='"stale"')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response.content, self.body[:11])
+
+    def test_matching_etag_wins_over_range(self):
+        etag = self.client.get(self.url, HTTP_RANGE="bytes=0-10")["ETag"]
+        response = self.client.get(self.url, HTTP_RANGE="bytes=0-10", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_if_modified_since_uses_the_file_mtime(self):
+        response = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=http_date(self.mtime))
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["Last-Modified"], http_date(self.mtime))
 
-# Create your tests here.
+        response = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=http_date(self.mtime - 60))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b"".join(response.streaming_content), self.body)
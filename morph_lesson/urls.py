@@ -1,7 +1,9 @@
 from django.urls import path
-from .views import LessonView
+from .views import LessonView, LessonContentView, LessonBundleView
 
 urlpatterns = [
     path("lessons/", LessonView.as_view()),  
     path("lesson/<str:title>/page/<int:page_number>/", LessonView.as_view()), 
+    path("lesson/<str:title>/page/<int:page_number>/content/", LessonContentView.as_view()),
+    path("lesson/<str:title>/bundle/", LessonBundleView.as_view()),
 ]
@@ -2,58 +2,132 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from rest_framework import status
-from morph_lesson.models import Lesson, Page
+from django.http import FileResponse, HttpResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, parse_etags, quote_etag
+from morph_lesson.catalogue import get_catalogue
+from morph_lesson.content import accepted_encodings, file_etag, lesson_bundle, page_file, parse_range, pick_variant
+
+CONTENT_CACHE_CONTROL = "private, max-age=3600"
+MARKDOWN_CONTENT_TYPE = "text/markdown; charset=utf-8"
+
+
+def conditional_response(request, data, etag, last_modified):
+    etag = quote_etag(etag)
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = Response(data, status=status.HTTP_200_OK)
+    response["ETag"] = etag
+    response["Last-Modified"] = http_date(last_modified)
+    response["Cache-Control"] = "private, no-cache"
+    return response
 
 
 class LessonView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request, title=None, page_number=None):
-        def build_file_info(page_obj):
-            return page_obj.filename, page_obj.file_url 
+        catalogue = get_catalogue()
+        last_modified = catalogue["last_modified"]
 
         if title and page_number is not None:
-            try:
-                lesson = Lesson.objects.get(title__iexact=title)
-            except Lesson.DoesNotExist:
+            if title.lower() not in catalogue["lessons_by_title"]:
                 return Response({"error": "Lesson not found."}, status=status.HTTP_404_NOT_FOUND)
 
-            try:
-                page = lesson.pages.get(page=page_number)
-            except Page.DoesNotExist:
+            found = catalogue["pages"].get((title.lower(), page_number))
+            if found is None:
                 return Response({"error": "Page not found in lesson."}, status=status.HTTP_404_NOT_FOUND)
 
-            filename, file_url = build_file_info(page)
-            return Response({
-                "lesson": lesson.title,
-                "page": {
-                    "page": page.page,
-                    "title": page.title,
-                    "filename": filename,
-                    "file_url": file_url
-                }
-            }, status=status.HTTP_200_OK)
+            entry, etag = found
+            return conditional_response(request, entry, etag, last_modified)
 
         if request.query_params.get("only_titles") == "true":
-            titles = Lesson.objects.values_list("title", flat=True)
-            return Response(list(titles), status=status.HTTP_200_OK)
-
-        lessons = Lesson.objects.prefetch_related("pages").all()
-        data = []
-        for lesson in lessons:
-            pages = []
-            for page in lesson.pages.all():
-                filename, file_url = build_file_info(page)
-                pages.append({
-                    "page": page.page,
-                    "title": page.title,
-                    "filename": filename,
-                    "file_url": file_url
-                })
-
-            data.append({
-                "title": lesson.title,
-                "pages": pages
-            })
-
-        return Response(data, status=status.HTTP_200_OK)
+            return conditional_response(request, catalogue["titles"], catalogue["titles_etag"], last_modified)
+
+        return conditional_response(request, catalogue["lessons"], catalogue["lessons_etag"], last_modified)
+
+
+def range_response(request, path, etag):
+    header = request.headers.get("Range")
+    if not header:
+        return None
+    if_range = request.headers.get("If-Range")
+    if if_range and quote_etag(etag) not in parse_etags(if_range):
+        return None
+
+    size = path.stat().st_size
+    byte_range = parse_range(header, size)
+    if byte_range is None:
+        return None
+    if byte_range == "unsatisfiable":
+        response = HttpResponse(status=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE)
+        response["Content-Range"] = f"bytes */{size}"
+        return response
+
+    start, end = byte_range
+    with path.open("rb") as fh:
+        fh.seek(start)
+        data = fh.read(end - start + 1)
+    response = HttpResponse(data, status=status.HTTP_206_PARTIAL_CONTENT, content_type=MARKDOWN_CONTENT_TYPE)
+    response["Content-Range"] = f"bytes {start}-{end}/{size}"
+    return response
+
+
+class LessonContentView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, title, page_number):
+        catalogue = get_catalogue()
+        found = catalogue["pages"].get((title.lower(), page_number))
+        path = page_file(title, found[0]["page"]["filename"]) if found else None
+        if path is None:
+            return Response({"error": "Page not found in lesson."}, status=status.HTTP_404_NOT_FOUND)
+
+        if request.headers.get("Range"):
+            # Ranges are cut from the identity bytes, so that is the representation being validated.
+            variant, encoding = path, None
+        else:
+            variant, encoding = pick_variant(path, request.headers.get("Accept-Encoding", ""))
+        etag = quote_etag(file_etag(path, encoding))
+        mtime = path.stat().st_mtime
+
+        # Preconditions first: a Range request whose cached copy is still valid gets 304, not 206.
+        response = get_conditional_response(request, etag=etag, last_modified=int(mtime))
+        if response is None:
+            response = range_response(request, path, file_etag(path))
+        if response is None:
+            # FileResponse hands the open file to wsgi.file_wrapper, i.e. sendfile where available.
+            response = FileResponse(variant.open("rb"), content_type=MARKDOWN_CONTENT_TYPE, filename=path.name)
+            if encoding:
+                response["Content-Encoding"] = encoding
+
+        response["ETag"] = etag
+        response["Accept-Ranges"] = "bytes"
+        response["Cache-Control"] = CONTENT_CACHE_CONTROL
+        response["Last-Modified"] = http_date(mtime)
+        patch_vary_headers(response, ["Accept-Encoding"])
+        return response
+
+
+class LessonBundleView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, title):
+        catalogue = get_catalogue()
+        lesson = catalogue["lessons_by_title"].get(title.lower())
+        if lesson is None:
+            return Response({"error": "Lesson not found."}, status=status.HTTP_404_NOT_FOUND)
+
+        bundle = lesson_bundle(lesson["title"], lesson["pages"], catalogue["last_modified"])
+        use_gzip = "gzip" in accepted_encodings(request.headers.get("Accept-Encoding", ""))
+        etag = quote_etag(f"{bundle['etag']}-gzip" if use_gzip else bundle["etag"])
+
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = HttpResponse(bundle["gzip"] if use_gzip else bundle["raw"], content_type="application/json")
+            if use_gzip:
+                response["Content-Encoding"] = "gzip"
+        response["ETag"] = etag
+        response["Cache-Control"] = "private, no-cache"
+        patch_vary_headers(response, ["Accept-Encoding"])
+        return response